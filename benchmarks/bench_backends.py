@@ -0,0 +1,84 @@
+import argparse
+import io
+import sys
+import time
+from pathlib import Path
+
+# The interpreting QudMachine against the TranspiledMachine, which translates the program to Python, on the
+# same .qud program: a long running CPL program (nested loops over int and float arithmetic, a division and
+# conversions) or a .qud file given on the command line. Both have to print the same output.
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from pipeline import Compiler
+from qud_vm import QudMachine, decode, load
+from qud_transpiler import TranspiledMachine
+
+PROGRAM = """
+i, j, n, total, steps : int;
+x, y : float;
+{{
+    n = {iterations};
+    i = 0;
+    total = 0;
+    x = 0.5;
+    while (i < n) {{
+        j = 0;
+        while (j < 10) {{
+            total = total + (i * j) / 3 - j;
+            x = x * 0.5 + static_cast<float>(j) / 7.0;
+            if (total > 1000000 || total < 0 - 1000000) total = total / 2; else steps = steps + 1;
+            j = j + 1;
+        }}
+        y = x + static_cast<float>(static_cast<int>(x * 100.0));
+        i = i + 1;
+    }}
+    output(total);
+    output(steps);
+    output(y);
+}}
+"""
+
+def measure(machine_class, program, runs):
+    # (best run time, instructions executed, output, time to create the machine)
+    best = None
+    for _ in range(runs):
+        output = io.StringIO()
+        start = time.perf_counter()
+        machine = machine_class(program, io.StringIO(), output)
+        created = time.perf_counter() - start
+        machine.run()
+        best = machine.elapsed if best is None else min(best, machine.elapsed)
+    return best, machine.executed, output.getvalue(), created
+
+def main():
+    parser = argparse.ArgumentParser(description='Interpreter against translated Python benchmark')
+    parser.add_argument('-f', '--file', type=Path, help='A .qud or .qudb file to run instead of the built in program')
+    parser.add_argument('-i', '--iterations', type=int, default=20000, help='Outer loop count of the built in program')
+    parser.add_argument('-O', '--optimize', type=int, nargs='?', const=1, default=0, metavar='LEVEL',
+                        help='Optimization level the built in program is compiled with')
+    parser.add_argument('-n', '--runs', type=int, default=3, help='Number of runs, the best one is reported')
+    args = parser.parse_args()
+
+    if args.file is not None:
+        program = load(args.file)
+    else:
+        code = Compiler(args.optimize).compile_source(PROGRAM.format(iterations=args.iterations))
+        if code is None:
+            raise Exception("The benchmark program has errors")
+        program = decode(code)
+
+    results = {}
+    for name, machine_class in (("vm", QudMachine), ("python", TranspiledMachine)):
+        elapsed, executed, output, created = measure(machine_class, program, args.runs)
+        results[name] = (elapsed, output)
+        print(f"{name:<8} {executed:>12,} instructions in {elapsed * 1000:>9.1f} ms "
+              f"({executed / elapsed:>13,.0f} instructions/s), set up in {created * 1000:.1f} ms")
+
+    if results["vm"][1] != results["python"][1]:
+        raise Exception("The backends printed different output")
+    print(f"translated Python runs {results['vm'][0] / results['python'][0]:.1f}x faster")
+
+if __name__ == '__main__':
+    main()
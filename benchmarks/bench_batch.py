@@ -0,0 +1,95 @@
+import argparse
+import io
+import random
+import sys
+import time
+from pathlib import Path
+
+# Running a program once per input record on the QudMachine against running all the records at once on the
+# BatchMachine, for growing numbers of records. The built in program reads a loop count and a float from
+# each record, so the lanes leave its loops at different times, or a .qud file is given on the command line
+# with records of random ints. Both have to print the same for every record.
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from pipeline import Compiler
+from qud_vm import QudMachine, decode, load
+from qud_batch import BatchMachine
+
+PROGRAM = """
+n, i, total : int;
+x, y : float;
+{
+    input(n);
+    input(x);
+    i = 0;
+    total = 0;
+    y = 0.0;
+    while (i < n) {
+        if (i * i > n) total = total + i / 3; else total = total - 1;
+        y = y * 0.5 + x * static_cast<float>(i);
+        i = i + 1;
+    }
+    output(total);
+    output(y);
+}
+"""
+
+def make_records(count, fields, seed):
+    generator = random.Random(seed)
+    if fields is None:
+        return [[str(generator.randint(20, 80)), f"{generator.uniform(-5, 5):.3f}"] for _ in range(count)]
+    return [[str(generator.randint(-100, 100)) for _ in range(fields)] for _ in range(count)]
+
+def run_each(program, records):
+    outputs = []
+    start = time.perf_counter()
+    for record in records:
+        output = io.StringIO()
+        machine = QudMachine(program, io.StringIO("".join(f"{field}\n" for field in record)), output)
+        try:
+            machine.run()
+        except Exception:
+            pass
+        outputs.append(output.getvalue().split())
+    return time.perf_counter() - start, outputs
+
+def run_batch(program, records):
+    start = time.perf_counter()
+    machine = BatchMachine(program, records)
+    machine.run()
+    return time.perf_counter() - start, machine.outputs
+
+def main():
+    parser = argparse.ArgumentParser(description='One run per record against batch execution benchmark')
+    parser.add_argument('-f', '--file', type=Path, help='A .qud or .qudb file to run instead of the built in program')
+    parser.add_argument('--fields', type=int, default=4, help='Input values per record for a program given with -f')
+    parser.add_argument('-O', '--optimize', type=int, nargs='?', const=1, default=0, metavar='LEVEL',
+                        help='Optimization level the built in program is compiled with')
+    parser.add_argument('-r', '--records', type=int, nargs='+', default=[10, 100, 1000, 10000],
+                        help='Record counts to run')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the random records')
+    args = parser.parse_args()
+
+    if args.file is not None:
+        program = load(args.file)
+        fields = args.fields
+    else:
+        code = Compiler(args.optimize).compile_source(PROGRAM)
+        if code is None:
+            raise Exception("The benchmark program has errors")
+        program = decode(code)
+        fields = None
+
+    for count in args.records:
+        records = make_records(count, fields, args.seed)
+        each, expected = run_each(program, records)
+        batch, outputs = run_batch(program, records)
+        if outputs != expected:
+            raise Exception(f"The batch printed different output with {count} records")
+        print(f"{count:>8} records: one at a time {each * 1000:>9.1f} ms ({count / each:>10,.0f} records/s), "
+              f"batch {batch * 1000:>9.1f} ms ({count / batch:>10,.0f} records/s), {each / batch:.1f}x")
+
+if __name__ == '__main__':
+    main()
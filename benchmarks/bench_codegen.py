@@ -0,0 +1,58 @@
+import argparse
+import sys
+import time
+from pathlib import Path
+
+# Code generation time for long arithmetic chains: the tokens are lexed up front, so the time is only the
+# parser and the QuadGenerator building the quads of assignments whose expressions mix ints, floats,
+# literals and casts.
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from parser import CPLParser
+from fast_lexer import FastCPLLexer
+
+OPERANDS = ["a", "b", "x", "y", "7", "2.5", "static_cast<float>(a)", "static_cast<int>(y)", "(b - 3)"]
+OPERATORS = ["+", "*", "-", "/"]
+
+def make_source(statements, chain_length):
+    lines = ["a, b, i : int;", "x, y, z : float;", "{"]
+    for statement in range(statements):
+        terms = [OPERANDS[(statement + index) % len(OPERANDS)] for index in range(chain_length)]
+        expression = terms[0]
+        for index, term in enumerate(terms[1:]):
+            expression += f" {OPERATORS[(statement + index) % len(OPERATORS)]} {term}"
+        target = "z" if statement % 2 else "x"
+        lines.append(f"{target} = {expression};")
+    lines.append("}")
+    return "\n".join(lines)
+
+def measure(tokens, runs):
+    best = None
+    quads = 0
+    for _ in range(runs):
+        parser = CPLParser()
+        start = time.perf_counter()
+        result = parser.parse(iter(tokens))
+        elapsed = time.perf_counter() - start
+        if parser.errors_found:
+            raise Exception("The generated program has errors")
+        best = elapsed if best is None else min(best, elapsed)
+        quads = sum(1 for _ in result.code)
+    return quads, best
+
+def main():
+    parser = argparse.ArgumentParser(description='Code generation benchmark')
+    parser.add_argument('-s', '--statements', type=int, default=2000, help='Number of assignments')
+    parser.add_argument('-c', '--chain', type=int, default=40, help='Number of operands in each expression')
+    parser.add_argument('-n', '--runs', type=int, default=5, help='Number of runs, the best one is reported')
+    args = parser.parse_args()
+
+    tokens = list(FastCPLLexer().tokenize(make_source(args.statements, args.chain)))
+    quads, elapsed = measure(tokens, args.runs)
+    print(f"{len(tokens)} tokens, {quads} quads in {elapsed * 1000:.1f} ms "
+          f"({len(tokens) / elapsed:,.0f} tokens/s, {quads / elapsed:,.0f} quads/s)")
+
+if __name__ == '__main__':
+    main()
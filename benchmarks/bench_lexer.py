@@ -0,0 +1,70 @@
+import argparse
+import sys
+import time
+from pathlib import Path
+
+# Lexer throughput: tokens per second of the SLY CPLLexer and the single regex FastCPLLexer on the same
+# source, which is a block of statements repeated until it has the requested number of lines. The token
+# streams of both lexers are compared before anything is timed.
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from lexer import CPLLexer
+from fast_lexer import FastCPLLexer
+
+DECLARATIONS = """a, b, integer : int;
+x, iffy : float;
+"""
+
+STATEMENTS = """    /* reads two numbers
+       and compares them */
+    input(a);
+    input(x);
+    if (a >= 10 && !(x < 2.5) || a != b)
+        integer = static_cast<int>(x * 3.25) + a / 2;
+    else
+        iffy = x - static_cast<float>(a);
+    while (integer < 100) {
+        integer = integer + 1;
+    }
+    output(integer);
+"""
+
+def make_source(lines):
+    repeats = max(1, lines // STATEMENTS.count("\n"))
+    return DECLARATIONS + "{\n" + STATEMENTS * repeats + "}\n"
+
+def token_stream(lexer, source):
+    return [(token.type, token.value, token.lineno, token.index, token.end) for token in lexer.tokenize(source)]
+
+def measure(make_lexer, source, runs):
+    best = None
+    for _ in range(runs):
+        lexer = make_lexer()
+        start = time.perf_counter()
+        count = sum(1 for _ in lexer.tokenize(source))
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return count, best
+
+def main():
+    parser = argparse.ArgumentParser(description='Lexer throughput benchmark')
+    parser.add_argument('-l', '--lines', type=int, default=20000, help='Number of source lines to lex')
+    parser.add_argument('-n', '--runs', type=int, default=5, help='Number of runs, the best one is reported')
+    args = parser.parse_args()
+
+    source = make_source(args.lines)
+    if token_stream(CPLLexer(), source) != token_stream(FastCPLLexer(), source):
+        print("The lexers produce different tokens", file=sys.stderr)
+        sys.exit(1)
+
+    rates = {}
+    for name, make_lexer in (("sly", CPLLexer), ("fast", FastCPLLexer)):
+        count, elapsed = measure(make_lexer, source, args.runs)
+        rates[name] = count / elapsed
+        print(f"{name}: {count} tokens in {elapsed * 1000:.1f} ms ({rates[name]:,.0f} tokens/s)")
+    print(f"fast lexer is {rates['fast'] / rates['sly']:.2f}x the throughput of the sly lexer")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+# Throughput and peak memory of the whole pipeline, from the source text to the .qud text, on generated
+# programs that grow along one dimension at a time: statement count, expression length, nesting depth,
+# declaration count and the int/float mix. Each suite keeps everything else fixed, so throughput that
+# drops as one dimension grows points at a quadratic path. The results are written to a JSON file, and a
+# previous results file can be given to flag every case that got slower.
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+from pipeline import Compiler
+from lexer import CPLLexer
+from program_generator import generate_program
+
+# (suite, the option it varies, its values, the fixed options)
+SUITES = [
+    ("statements", "statements", [1000, 4000, 16000], {}),
+    ("expression length", "expression_length", [4, 32, 128], {"statements": 500}),
+    ("nesting depth", "depth", [0, 3, 6], {"statements": 500, "control_ratio": 0.4}),
+    ("declarations", "declarations", [10, 1000, 10000], {"statements": 2000}),
+    ("float ratio", "float_ratio", [0.0, 0.5, 1.0], {"statements": 2000}),
+]
+
+DEFAULT_RESULTS = ROOT / "benchmarks" / "results.json"
+
+def make_compiler(level, lexer):
+    compiler = Compiler(level)
+    if lexer == "sly":
+        compiler.lexer = CPLLexer()
+    return compiler
+
+def compile_once(compiler, source):
+    output = compiler.compile_source(source)
+    if output is None:
+        raise Exception("The generated program has errors")
+    # every quad ends its line, the signature after HALT does not
+    return output.count("\n")
+
+def measure(source, level, lexer, runs):
+    compiler = make_compiler(level, lexer)
+    best = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        quads = compile_once(compiler, source)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    # a run of its own, tracemalloc would slow the timed runs down
+    tracemalloc.start()
+    try:
+        compile_once(compiler, source)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    lines = source.count("\n")
+    return {
+        "lines": lines,
+        "quads": quads,
+        "seconds": best,
+        "lines_per_second": lines / best,
+        "quads_per_second": quads / best,
+        "peak_bytes": peak,
+    }
+
+def run_suites(level, lexer, runs, scale, selected):
+    results = []
+    for suite, option, values, fixed in SUITES:
+        if selected and suite not in selected:
+            continue
+        for value in values:
+            options = dict(fixed)
+            options["statements"] = max(int(options.get("statements", 1000) * scale), 1)
+            options[option] = value if option != "statements" else max(int(value * scale), 1)
+            result = measure(generate_program(**options), level, lexer, runs)
+            result.update(suite=suite, option=option, value=options[option])
+            results.append(result)
+            print(f"{suite:<18} {option}={options[option]:<8} {result['lines']:>8} lines {result['quads']:>9} quads "
+                  f"{result['seconds'] * 1000:>9.1f} ms {result['lines_per_second']:>10,.0f} lines/s "
+                  f"{result['quads_per_second']:>10,.0f} quads/s {result['peak_bytes'] / 1024 / 1024:>8.1f} MB")
+    return results
+
+def compare(results, previous_path, threshold):
+    # the number of cases whose throughput dropped by more than threshold against the previous results
+    with open(previous_path) as previous_file:
+        previous = {(result["suite"], result["value"]): result for result in json.load(previous_file)["results"]}
+
+    regressions = 0
+    for result in results:
+        before = previous.get((result["suite"], result["value"]))
+        if before is None:
+            continue
+        ratio = result["quads_per_second"] / before["quads_per_second"]
+        if ratio < 1 - threshold:
+            regressions += 1
+            print(f"Regression: {result['suite']} {result['option']}={result['value']} runs at {ratio:.0%} "
+                  f"of its previous throughput", file=sys.stderr)
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Pipeline benchmark on generated programs')
+    parser.add_argument('-O', '--optimize', type=int, nargs='?', const=1, default=0, metavar='LEVEL',
+                        help='Optimization level of the compiler')
+    parser.add_argument('--lexer', choices=['fast', 'sly'], default='fast',
+                        help='The lexer of the pipeline, fast (FastCPLLexer) or sly (CPLLexer)')
+    parser.add_argument('-n', '--runs', type=int, default=3, help='Number of runs, the best one is reported')
+    parser.add_argument('--scale', type=float, default=1.0, help='Factor for the statement count of every case')
+    parser.add_argument('--suite', action='append', choices=[suite for suite, _, _, _ in SUITES],
+                        help='Only run this suite, can be given more than once')
+    parser.add_argument('-o', '--output', type=Path, default=DEFAULT_RESULTS, help='The results file to write')
+    parser.add_argument('--compare', type=Path, metavar='RESULTS', help='A previous results file to compare with')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='Throughput drop against --compare that counts as a regression (default 0.2)')
+    args = parser.parse_args()
+
+    results = run_suites(args.optimize, args.lexer, args.runs, args.scale, args.suite)
+    with open(args.output, "w") as output:
+        json.dump({
+            "python": platform.python_version(),
+            "level": args.optimize,
+            "lexer": args.lexer,
+            "runs": args.runs,
+            "scale": args.scale,
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "results": results,
+        }, output, indent=2)
+
+    if args.compare is not None and compare(results, args.compare, args.threshold):
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
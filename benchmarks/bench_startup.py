@@ -0,0 +1,47 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+# Cold vs warm start of the compiler: the time for a fresh interpreter to import the parser and create
+# a CPLParser, with the parse table cache removed before every run (cold) and left in place (warm).
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from parse_table_cache import CACHE_PATH
+
+STARTUP = "import parser; parser.CPLParser()"
+
+def time_startup():
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", STARTUP], cwd=ROOT, check=True)
+    return time.perf_counter() - start
+
+def measure(runs, cold):
+    timings = []
+    for _ in range(runs):
+        if cold and os.path.exists(CACHE_PATH):
+            os.remove(CACHE_PATH)
+        timings.append(time_startup())
+    return timings
+
+def main():
+    parser = argparse.ArgumentParser(description='Compiler startup benchmark')
+    parser.add_argument('-n', '--runs', type=int, default=20, help='Number of runs for each measurement')
+    args = parser.parse_args()
+
+    # leaves the cache warm for the second measurement
+    cold = measure(args.runs, cold=True)
+    warm = measure(args.runs, cold=False)
+
+    for name, timings in (("cold", cold), ("warm", warm)):
+        print(f"{name}: median {statistics.median(timings) * 1000:.1f} ms, "
+              f"min {min(timings) * 1000:.1f} ms over {len(timings)} runs")
+    print(f"warm start saves {(statistics.median(cold) - statistics.median(warm)) * 1000:.1f} ms per invocation")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+import argparse
+import random
+
+# Generates valid CPL programs of a given shape for the benchmarks. Every expression is built for the type
+# it is assigned to, so an int variable only ever gets an int expression (float parts of it are cast), and
+# divisors are non-zero literals. The programs are never meant to be run, loops need not terminate.
+
+INDENT = "    "
+RELOPS = ["==", "!=", "<", ">", "<=", ">="]
+
+class ProgramGenerator:
+
+    def __init__(self, declarations=20, statements=1000, expression_length=8, depth=2, float_ratio=0.5,
+                 control_ratio=0.2, seed=0):
+        self.random = random.Random(seed)
+        self.statements = statements
+        self.expression_length = expression_length
+        self.depth = depth
+        self.float_ratio = float_ratio
+        self.control_ratio = control_ratio
+
+        floats = round(declarations * float_ratio)
+        self.int_names = [f"i{index}" for index in range(max(declarations - floats, 1))]
+        self.float_names = [f"f{index}" for index in range(max(floats, 1))]
+
+    def literal(self, is_float):
+        if is_float:
+            return f"{self.random.randint(0, 99)}.{self.random.randint(0, 9)}"
+        return str(self.random.randint(0, 99))
+
+    def operand(self, is_float):
+        # an int operand of a float expression is converted by the compiler, a float one of an int
+        # expression needs a cast
+        choice = self.random.random()
+        operand_is_float = self.random.random() < self.float_ratio
+        if choice < 0.3:
+            operand = self.literal(operand_is_float)
+        else:
+            operand = self.random.choice(self.float_names if operand_is_float else self.int_names)
+        if operand_is_float and not is_float:
+            return f"static_cast<int>({operand})"
+        return operand
+
+    def expression(self, is_float, length=None):
+        length = self.expression_length if length is None else length
+        text = self.operand(is_float)
+        for _ in range(length - 1):
+            operator = self.random.choice("+-*/")
+            if operator == "/":
+                text += f" / {self.random.randint(1, 9)}"
+            elif self.random.random() < 0.1:
+                text += f" {operator} ({self.operand(is_float)} + {self.operand(is_float)})"
+            else:
+                text += f" {operator} {self.operand(is_float)}"
+        return text
+
+    def condition(self):
+        is_float = self.random.random() < self.float_ratio
+        length = max(self.expression_length // 2, 1)
+        relation = (f"{self.expression(is_float, length)} {self.random.choice(RELOPS)} "
+                    f"{self.expression(is_float, length)}")
+        choice = self.random.random()
+        if choice < 0.2:
+            return f"{relation} && {self.random.choice(self.int_names)} != 0"
+        if choice < 0.3:
+            return f"!({relation}) || {self.random.choice(self.int_names)} < 10"
+        return relation
+
+    def simple_statement(self):
+        choice = self.random.random()
+        if choice < 0.7:
+            is_float = self.random.random() < self.float_ratio
+            target = self.random.choice(self.float_names if is_float else self.int_names)
+            return f"{target} = {self.expression(is_float)};"
+        if choice < 0.9:
+            return f"output({self.expression(self.random.random() < self.float_ratio)});"
+        return f"input({self.random.choice(self.int_names + self.float_names)});"
+
+    def statement(self, lines, indent, depth):
+        prefix = INDENT * indent
+        if depth <= 0 or self.random.random() >= self.control_ratio:
+            lines.append(prefix + self.simple_statement())
+            return
+
+        if self.random.random() < 0.5:
+            lines.append(f"{prefix}if ({self.condition()}) {{")
+            self.block(lines, indent + 1, depth - 1)
+            lines.append(f"{prefix}}} else {{")
+            self.block(lines, indent + 1, depth - 1)
+            lines.append(prefix + "}")
+        else:
+            lines.append(f"{prefix}while ({self.condition()}) {{")
+            self.block(lines, indent + 1, depth - 1)
+            lines.append(prefix + "}")
+
+    def block(self, lines, indent, depth):
+        for _ in range(self.random.randint(1, 3)):
+            self.statement(lines, indent, depth)
+
+    def generate(self):
+        lines = [f"{', '.join(self.int_names)} : int;", f"{', '.join(self.float_names)} : float;", "{"]
+        for _ in range(self.statements):
+            self.statement(lines, 1, self.depth)
+        lines.append("}")
+        return "\n".join(lines) + "\n"
+
+def generate_program(**options):
+    return ProgramGenerator(**options).generate()
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a CPL program for the benchmarks')
+    parser.add_argument('-o', '--output', required=True, help='The .ou file to write')
+    parser.add_argument('-d', '--declarations', type=int, default=20, help='Number of declared variables')
+    parser.add_argument('-s', '--statements', type=int, default=1000, help='Number of top level statements')
+    parser.add_argument('-e', '--expression-length', type=int, default=8, help='Number of operands in an expression')
+    parser.add_argument('--depth', type=int, default=2, help='Maximum nesting depth of if and while statements')
+    parser.add_argument('--float-ratio', type=float, default=0.5, help='Share of float variables and operands')
+    parser.add_argument('--control-ratio', type=float, default=0.2,
+                        help='Chance that a statement above the maximum depth is an if or while')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed')
+    args = parser.parse_args()
+
+    source = generate_program(declarations=args.declarations, statements=args.statements,
+                              expression_length=args.expression_length, depth=args.depth,
+                              float_ratio=args.float_ratio, control_ratio=args.control_ratio, seed=args.seed)
+    with open(args.output, "w") as output:
+        output.write(source)
+
+if __name__ == '__main__':
+    main()
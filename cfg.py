@@ -0,0 +1,149 @@
+from consts import *
+from quad import Quad
+from constant_folding import literal_value
+from peephole import thread_jumps
+
+# The control flow graph of a program's quads, before labels are resolved. A basic block starts at a label
+# or after a jump and runs to the next jump or label, the labels that name it are kept apart from its quads.
+# A block's successors are the targets of its jump and the block after it when control can fall through,
+# the last block falls through to the end of the program.
+
+class BasicBlock:
+
+    def __init__(self, index):
+        self.index = index
+        self.labels = []
+        self.quads = []
+        self.successors = []
+        self.predecessors = []
+
+    def jump(self):
+        # the jump that ends the block, if any
+        if self.quads and self.quads[-1].is_jump():
+            return self.quads[-1]
+        return None
+
+    def falls_through(self):
+        return not self.quads or self.quads[-1].opcode != JUMP
+
+    def name(self):
+        return f"B{self.index}"
+
+    def __str__(self):
+        labels = f" ({', '.join(label.name for label in self.labels)})" if self.labels else ""
+        successors = ", ".join(successor.name() for successor in self.successors) or "end"
+        lines = [f"{self.name()}{labels} -> {successors}"]
+        lines.extend(f"    {quad}" for quad in self.quads)
+        return "\n".join(lines)
+
+class ControlFlowGraph:
+
+    def __init__(self, blocks):
+        self.blocks = blocks
+        self.link()
+
+    @classmethod
+    def from_quads(cls, quads):
+        blocks = []
+        block = None
+        for quad in quads:
+            if quad.opcode == LABEL:
+                # consecutive labels name the same block
+                if block is None or block.quads:
+                    block = BasicBlock(len(blocks))
+                    blocks.append(block)
+                block.labels.append(quad.arg1)
+                continue
+
+            if block is None:
+                block = BasicBlock(len(blocks))
+                blocks.append(block)
+            block.quads.append(quad)
+            if quad.is_jump():
+                block = None
+        return cls(blocks)
+
+    def link(self):
+        by_label = {label.name: block for block in self.blocks for label in block.labels}
+        for index, block in enumerate(self.blocks):
+            block.index = index
+            block.successors = []
+            block.predecessors = []
+        for index, block in enumerate(self.blocks):
+            jump = block.jump()
+            if jump is not None:
+                target = by_label.get(jump.arg1.name)
+                if target is None:
+                    raise Exception(f"Undefined label: {jump.arg1.name}")
+                block.successors.append(target)
+            if block.falls_through() and index + 1 < len(self.blocks):
+                following = self.blocks[index + 1]
+                if following not in block.successors:
+                    block.successors.append(following)
+            for successor in block.successors:
+                successor.predecessors.append(block)
+
+    def reachable(self):
+        if not self.blocks:
+            return set()
+        seen = {self.blocks[0].index}
+        stack = [self.blocks[0]]
+        while stack:
+            for successor in stack.pop().successors:
+                if successor.index not in seen:
+                    seen.add(successor.index)
+                    stack.append(successor)
+        return seen
+
+    def remove_unreachable(self):
+        # the kept blocks stay in order, a block that falls through is followed by its successor either way
+        reachable = self.reachable()
+        removed = len(self.blocks) - len(reachable)
+        if removed:
+            self.blocks = [block for block in self.blocks if block.index in reachable]
+            self.link()
+        return removed
+
+    def to_quads(self):
+        # The quads of the blocks in order. A jump to the block right after its own is dropped, control gets
+        # there anyway, and so is every label no remaining jump refers to.
+        jumps = []
+        for index, block in enumerate(self.blocks):
+            jump = block.jump()
+            following = self.blocks[index + 1] if index + 1 < len(self.blocks) else None
+            if jump is not None and following is not None and any(label.name == jump.arg1.name
+                                                                  for label in following.labels):
+                jump = None
+            jumps.append(jump)
+        targets = {jump.arg1.name for jump in jumps if jump is not None}
+
+        quads = []
+        for block, jump in zip(self.blocks, jumps):
+            quads.extend(Quad(LABEL, label) for label in block.labels if label.name in targets)
+            if block.jump() is not None:
+                quads.extend(block.quads[:-1])
+                if jump is not None:
+                    quads.append(jump)
+            else:
+                quads.extend(block.quads)
+        return quads
+
+    def __str__(self):
+        return "\n".join(str(block) for block in self.blocks)
+
+def fold_branches(quads):
+    # a JMPZ on a literal either always jumps or never does
+    folded = []
+    for quad in quads:
+        if quad.opcode == JMPZ and quad.arg2.is_literal():
+            if literal_value(quad.arg2) != 0:
+                continue
+            quad = Quad(JUMP, quad.arg1)
+        folded.append(quad)
+    return folded
+
+def simplify_cfg(quads):
+    # jumps to a label followed by a JUMP are threaded first, which can leave the JUMP unreachable
+    graph = ControlFlowGraph.from_quads(thread_jumps(fold_branches(quads)))
+    graph.remove_unreachable()
+    return graph.to_quads()
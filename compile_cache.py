@@ -0,0 +1,137 @@
+import hashlib
+import json
+import os
+import shutil
+import sly
+from pathlib import Path
+
+# Compiled programs are cached by the hash of their source, the compiler and the options, so compiling
+# an unchanged .ou file again returns the stored .qud file and diagnostics without lexing or parsing.
+# An entry is a .json file with the diagnostics and, when the program compiled, a .qud file, both named
+# after the key. Reading an entry touches it, and once the directory grows past its size bound the least
+# recently used entries are removed.
+
+DEFAULT_CACHE_DIR = Path(os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache")) / "cpq"
+MAX_CACHE_BYTES = 64 * 1024 * 1024
+
+COMPILER_DIR = Path(__file__).resolve().parent
+
+compiler_version = None
+
+def get_compiler_version():
+    # a hash of the compiler's own modules, any change to the compiler invalidates the whole cache
+    global compiler_version
+    if compiler_version is None:
+        digest = hashlib.sha256()
+        digest.update(sly.__version__.encode())
+        for module in sorted(COMPILER_DIR.glob("*.py")):
+            digest.update(module.name.encode())
+            digest.update(module.read_bytes())
+        compiler_version = digest.hexdigest()
+    return compiler_version
+
+class CacheEntry:
+
+    # output_path is the cached .qud file, None when the program has errors, declarations are the
+    # (name, type) pairs of its symbol table
+
+    def __init__(self, output_path, diagnostics, declarations=None):
+        self.output_path = output_path
+        self.diagnostics = diagnostics
+        self.declarations = declarations
+
+    def read_output(self):
+        return self.output_path.read_text() if self.output_path is not None else None
+
+class CompileCache:
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=MAX_CACHE_BYTES):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        # the size of the directory when it was last scanned plus what was written since, the directory
+        # is only scanned again once this passes max_bytes
+        self.size = None
+
+    def key(self, source, level):
+        digest = hashlib.sha256()
+        digest.update(get_compiler_version().encode())
+        digest.update(f"-O{level}\n".encode())
+        digest.update(source.encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, key):
+        entry_path = self.directory / f"{key}.json"
+        try:
+            with open(entry_path, encoding="utf-8") as entry_file:
+                entry = json.load(entry_file)
+            output_path = self.directory / f"{key}.qud" if entry["ok"] else None
+            if output_path is not None and not output_path.exists():
+                return None
+            os.utime(entry_path)
+            return CacheEntry(output_path, entry["diagnostics"], entry["declarations"])
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def put_file(self, key, output_path, diagnostics, declarations=None):
+        # output_path is the compiled .qud file, None for a program with errors
+        write_output = None
+        if output_path is not None:
+            write_output = lambda path: shutil.copyfile(output_path, path)
+        self.store(key, diagnostics, declarations, write_output)
+
+    def put_text(self, key, output, diagnostics, declarations=None):
+        write_output = None
+        if output is not None:
+            write_output = lambda path: path.write_text(output)
+        self.store(key, diagnostics, declarations, write_output)
+
+    def store(self, key, diagnostics, declarations, write_output):
+        # Every file is written to a temporary file and renamed, so a worker compiling the same source never
+        # reads half a file. The .json file goes last, an entry only exists once its .qud file is complete.
+        written = 0
+        ok = write_output is not None
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            if ok:
+                temporary_path = self.directory / f"{key}.qud.{os.getpid()}.tmp"
+                write_output(temporary_path)
+                written += temporary_path.stat().st_size
+                os.replace(temporary_path, self.directory / f"{key}.qud")
+
+            data = json.dumps({"ok": ok, "diagnostics": diagnostics, "declarations": declarations}).encode("utf-8")
+            temporary_path = self.directory / f"{key}.json.{os.getpid()}.tmp"
+            with open(temporary_path, "wb") as entry_file:
+                entry_file.write(data)
+            os.replace(temporary_path, self.directory / f"{key}.json")
+            written += len(data)
+        except OSError:
+            # the cache only saves time, a directory that can't be written just means no caching
+            return
+
+        if self.size is None or self.size + written > self.max_bytes:
+            self.evict()
+        else:
+            self.size += written
+
+    def evict(self):
+        entries = []
+        total = 0
+        for entry_path in self.directory.glob("*.json"):
+            output_path = entry_path.with_suffix(".qud")
+            try:
+                stat = entry_path.stat()
+                size = stat.st_size + (output_path.stat().st_size if output_path.exists() else 0)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, size, entry_path, output_path))
+            total += size
+
+        entries.sort()
+        for _, size, entry_path, output_path in entries:
+            if total <= self.max_bytes:
+                break
+            # another worker may have evicted it first
+            entry_path.unlink(missing_ok=True)
+            output_path.unlink(missing_ok=True)
+            total -= size
+        self.size = total
@@ -0,0 +1,213 @@
+import asyncio
+import io
+import json
+import os
+import socket
+import sys
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stderr, redirect_stdout
+from pathlib import Path
+
+from pipeline import Compiler
+from compile_cache import CompileCache
+
+# A long running compile server for cpq.py --serve. It listens on a Unix socket and answers one JSON object
+# per line:
+#
+#   {"command": "compile", "source": "...", "level": 0}  ->  {"ok": true, "output": "...", "diagnostics": "...",
+#                                                             "declarations": [["x", "FLOAT"], ...]}
+#   {"command": "stats"}                                 ->  {"requests": ..., "latency_ms": {"p50": ...}, ...}
+#   {"command": "shutdown"}                              ->  {"ok": true}
+#
+# The compiling is done by a pool of worker processes, each keeping a warm lexer and parser per optimization
+# level. CompileClient is the other end, used by cpq.py --server.
+
+DEFAULT_SOCKET = Path(tempfile.gettempdir()) / f"cpq-{os.getuid()}.sock"
+
+# lines can hold a whole program
+MAX_LINE = 64 * 1024 * 1024
+
+# latency percentiles are over the most recent requests
+LATENCY_WINDOW = 10000
+
+# the Compilers of a server worker process by optimization level, created on first use
+worker_compilers = {}
+worker_cache_dir = None
+
+def start_server_worker(cache_dir):
+    global worker_cache_dir
+    worker_cache_dir = cache_dir
+
+def compile_request(source, level):
+    compiler = worker_compilers.get(level)
+    if compiler is None:
+        cache = CompileCache(worker_cache_dir) if worker_cache_dir is not None else None
+        compiler = worker_compilers[level] = Compiler(level, cache=cache)
+
+    diagnostics = io.StringIO()
+    declarations = None
+    with redirect_stderr(diagnostics), redirect_stdout(diagnostics):
+        try:
+            output = compiler.compile_text(source)
+            declarations = compiler.declarations()
+        except Exception as e:
+            print(f"Error: {e}", file=sys.stderr)
+            output = None
+    return output, diagnostics.getvalue(), declarations
+
+def percentile(ordered, fraction):
+    # nearest rank
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+class CompileServer:
+
+    def __init__(self, socket_path=DEFAULT_SOCKET, jobs=None, cache_dir=None):
+        self.socket_path = Path(socket_path)
+        self.jobs = jobs
+        self.cache_dir = cache_dir
+        self.executor = None
+        self.stopped = None
+        self.started = time.time()
+        self.requests = 0
+        self.failed = 0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+
+    def stats(self):
+        ordered = sorted(self.latencies)
+        return {
+            "requests": self.requests,
+            "failed": self.failed,
+            "uptime_s": round(time.time() - self.started, 3),
+            "latency_ms": {
+                "p50": round(percentile(ordered, 0.50) * 1000, 3),
+                "p90": round(percentile(ordered, 0.90) * 1000, 3),
+                "p99": round(percentile(ordered, 0.99) * 1000, 3),
+                "max": round(ordered[-1] * 1000, 3) if ordered else 0.0,
+            },
+        }
+
+    async def compile(self, request):
+        start = time.perf_counter()
+        output, diagnostics, declarations = await asyncio.get_running_loop().run_in_executor(
+            self.executor, compile_request, request["source"], int(request.get("level", 0)))
+        self.latencies.append(time.perf_counter() - start)
+        self.requests += 1
+        if output is None:
+            self.failed += 1
+        return {"ok": output is not None, "output": output, "diagnostics": diagnostics,
+                "declarations": declarations}
+
+    async def respond(self, line):
+        try:
+            request = json.loads(line)
+            command = request.get("command", "compile")
+            if command == "compile":
+                return await self.compile(request)
+            if command == "stats":
+                return self.stats()
+            if command == "shutdown":
+                self.stopped.set()
+                return {"ok": True}
+            return {"error": f"Unknown command {command!r}"}
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            return {"error": f"Invalid request: {e}"}
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                response = await self.respond(line)
+                writer.write(json.dumps(response).encode("utf-8") + b"\n")
+                await writer.drain()
+        except (ConnectionError, asyncio.LimitOverrunError, ValueError):
+            pass
+        except asyncio.CancelledError:
+            # connections still open when the server shuts down
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self):
+        if self.socket_path.exists():
+            client = CompileClient(self.socket_path)
+            running = client.available()
+            client.close()
+            if running:
+                raise Exception(f"A compile server is already listening on {self.socket_path}")
+            # left behind by a server that didn't shut down cleanly
+            self.socket_path.unlink()
+
+        self.stopped = asyncio.Event()
+        with ProcessPoolExecutor(max_workers=self.jobs, initializer=start_server_worker,
+                                 initargs=(self.cache_dir,)) as self.executor:
+            server = await asyncio.start_unix_server(self.handle_connection, path=str(self.socket_path), limit=MAX_LINE)
+            print(f"Compile server listening on {self.socket_path}", file=sys.stderr)
+            try:
+                async with server:
+                    await self.stopped.wait()
+            finally:
+                self.socket_path.unlink(missing_ok=True)
+
+class CompileClient:
+
+    # a blocking client for scripts, one request at a time over one connection
+
+    def __init__(self, socket_path=DEFAULT_SOCKET):
+        self.socket_path = Path(socket_path)
+        self.connection = None
+        self.stream = None
+
+    def available(self):
+        try:
+            self.connect()
+            return True
+        except OSError:
+            return False
+
+    def connect(self):
+        if self.connection is None:
+            connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                connection.connect(str(self.socket_path))
+            except OSError:
+                connection.close()
+                raise
+            self.connection = connection
+            self.stream = connection.makefile("rwb")
+
+    def request(self, request):
+        self.connect()
+        self.stream.write(json.dumps(request).encode("utf-8") + b"\n")
+        self.stream.flush()
+        line = self.stream.readline()
+        if not line:
+            raise Exception("The compile server closed the connection")
+        response = json.loads(line)
+        if "error" in response:
+            raise Exception(response["error"])
+        return response
+
+    def compile(self, source, level=0):
+        # the .qud text or None, the diagnostics, and the declared variables as (name, type) pairs or None
+        response = self.request({"command": "compile", "source": source, "level": level})
+        return response["output"], response["diagnostics"], response.get("declarations")
+
+    def stats(self):
+        return self.request({"command": "stats"})
+
+    def shutdown(self):
+        return self.request({"command": "shutdown"})
+
+    def close(self):
+        if self.connection is not None:
+            self.stream.close()
+            self.connection.close()
+            self.connection = None
+            self.stream = None
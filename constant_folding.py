@@ -0,0 +1,145 @@
+import re
+from consts import *
+from quad import Quad, Operand, OperandKind
+from qud_vm import truncating_division
+
+# Compile time evaluation of quads whose operands are all literals. The results follow the QUD machine:
+# integer division truncates toward zero, relational operators produce the integer 1 or 0.
+
+INT_OPERATIONS = {
+    IADD: lambda a, b: a + b,
+    ISUB: lambda a, b: a - b,
+    IMLT: lambda a, b: a * b,
+    IDIV: truncating_division,
+}
+
+FLOAT_OPERATIONS = {
+    RADD: lambda a, b: a + b,
+    RSUB: lambda a, b: a - b,
+    RMLT: lambda a, b: a * b,
+    RDIV: lambda a, b: a / b,
+}
+
+RELATIONS = {
+    IEQL: lambda a, b: a == b,
+    INQL: lambda a, b: a != b,
+    ILSS: lambda a, b: a < b,
+    IGRT: lambda a, b: a > b,
+    REQL: lambda a, b: a == b,
+    RNQL: lambda a, b: a != b,
+    RLSS: lambda a, b: a < b,
+    RGRT: lambda a, b: a > b,
+}
+
+FLOAT_LITERAL_PATTERN = re.compile(r"\d+\.\d+")
+
+def literal_value(operand):
+    if operand.kind == OperandKind.INT_LITERAL:
+        return int(operand.name)
+    return float(operand.name)
+
+def make_literal(value):
+    # CPL has no negative or exponent literals, so results that can't be written as one are not folded
+    if isinstance(value, float):
+        text = repr(value)
+        if FLOAT_LITERAL_PATTERN.fullmatch(text):
+            return Operand(OperandKind.FLOAT_LITERAL, text)
+        return None
+    if value >= 0:
+        return Operand(OperandKind.INT_LITERAL, str(value))
+    return None
+
+def fold(opcode, *operands):
+    # returns the literal the quad computes, or None when it has to be left to run time
+    if not all(operand.is_literal() for operand in operands):
+        return None
+
+    values = [literal_value(operand) for operand in operands]
+
+    try:
+        if opcode == ITOR:
+            return make_literal(float(values[0]))
+        if opcode == RTOI:
+            return make_literal(int(values[0]))
+        if opcode in RELATIONS:
+            return make_literal(int(RELATIONS[opcode](*values)))
+        if opcode in INT_OPERATIONS:
+            if opcode == IDIV and values[1] == 0:
+                return None
+            return make_literal(INT_OPERATIONS[opcode](*values))
+        if opcode in FLOAT_OPERATIONS:
+            if opcode == RDIV and values[1] == 0:
+                return None
+            return make_literal(FLOAT_OPERATIONS[opcode](*map(float, values)))
+    except (OverflowError, ValueError):
+        # an int too large for a float, or an infinite or nan float converted to an int
+        return None
+    return None
+
+def assignment_for(literal):
+    return IASN if literal.kind == OperandKind.INT_LITERAL else RASN
+
+def propagate_constants(quads):
+
+    # Replaces reads of variables and temps that hold a known literal with the literal itself and folds
+    # the quads that become all-literal into plain assignments. Knowledge is dropped at every label, so it
+    # only flows through straight-line code (including the fall-through path of a JMPZ).
+    # Assignments to temps that are no longer read afterwards are removed.
+
+    propagated = []
+    known = {}
+
+    for quad in quads:
+        if quad.opcode == LABEL:
+            known.clear()
+            propagated.append(quad)
+            continue
+
+        if any(source.name in known for source in quad.used()):
+            quad = quad.replace_used(lambda operand: known.get(operand.name, operand))
+
+        target = quad.defined()
+        if target is not None:
+            literal = fold(quad.opcode, *quad.used()) if quad.opcode not in (IASN, RASN) else None
+            if literal is not None:
+                quad = Quad(assignment_for(literal), target, literal)
+
+            if (quad.opcode == IASN or quad.opcode == RASN) and quad.arg2.is_literal():
+                known[target.name] = quad.arg2
+            else:
+                known.pop(target.name, None)
+
+        propagated.append(quad)
+
+    return remove_dead_temps(propagated)
+
+def remove_dead_temps(quads):
+
+    # Temps are reused, so deadness is decided per assignment: walking backwards, an assignment to a temp
+    # is dead when the temp is assigned again before being read on the only path that follows it. Jumps
+    # end that path, so the set of overwritten temps is cleared there. Temps never read at all are dead too.
+
+    reads = set()
+    for quad in quads:
+        for source in quad.used():
+            if source.kind == OperandKind.TEMP:
+                reads.add(source.name)
+
+    live = []
+    overwritten = set()
+    for quad in reversed(quads):
+        if quad.is_jump():
+            overwritten.clear()
+
+        target = quad.defined()
+        if target is not None and target.kind == OperandKind.TEMP:
+            if target.name in overwritten or target.name not in reads:
+                continue
+            overwritten.add(target.name)
+
+        for source in quad.used():
+            overwritten.discard(source.name)
+        live.append(quad)
+
+    live.reverse()
+    return live
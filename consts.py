@@ -1,30 +1,63 @@
-IASN = "IASN"
-IPRT = "IPRT"
-IINP = "IINP"
-IEQL = "IEQL"
-INQL = "INQL"
-ILSS = "ILSS"
-IGRT = "IGRT"
-IADD = "IADD"
-ISUB = "ISUB"
-IMLT = "IMLT"
-IDIV = "IDIV"
-RASN = "RASN"
-RPRT = "RPRT"
-RINP = "RINP"
-REQL = "REQL"
-RNQL = "RNQL"
-RLSS = "RLSS"
-RGRT = "RGRT"
-RADD = "RADD"
-RSUB = "RSUB"
-RMLT = "RMLT"
-RDIV = "RDIV"
-ITOR = "ITOR"
-RTOI = "RTOI"
-JUMP = "JUMP"
-JMPZ = "JMPZ"
-HALT = "HALT"
+from enum import IntEnum
+
+class Opcode(IntEnum):
+    IASN = 0
+    IPRT = 1
+    IINP = 2
+    IEQL = 3
+    INQL = 4
+    ILSS = 5
+    IGRT = 6
+    IADD = 7
+    ISUB = 8
+    IMLT = 9
+    IDIV = 10
+    RASN = 11
+    RPRT = 12
+    RINP = 13
+    REQL = 14
+    RNQL = 15
+    RLSS = 16
+    RGRT = 17
+    RADD = 18
+    RSUB = 19
+    RMLT = 20
+    RDIV = 21
+    ITOR = 22
+    RTOI = 23
+    JUMP = 24
+    JMPZ = 25
+    HALT = 26
+    LABEL = 27 # pseudo instruction marking a jump target, never written to the .qud file
+
+IASN = Opcode.IASN
+IPRT = Opcode.IPRT
+IINP = Opcode.IINP
+IEQL = Opcode.IEQL
+INQL = Opcode.INQL
+ILSS = Opcode.ILSS
+IGRT = Opcode.IGRT
+IADD = Opcode.IADD
+ISUB = Opcode.ISUB
+IMLT = Opcode.IMLT
+IDIV = Opcode.IDIV
+RASN = Opcode.RASN
+RPRT = Opcode.RPRT
+RINP = Opcode.RINP
+REQL = Opcode.REQL
+RNQL = Opcode.RNQL
+RLSS = Opcode.RLSS
+RGRT = Opcode.RGRT
+RADD = Opcode.RADD
+RSUB = Opcode.RSUB
+RMLT = Opcode.RMLT
+RDIV = Opcode.RDIV
+ITOR = Opcode.ITOR
+RTOI = Opcode.RTOI
+JUMP = Opcode.JUMP
+JMPZ = Opcode.JMPZ
+HALT = Opcode.HALT
+LABEL = Opcode.LABEL
 INT = "INT"
 FLOAT = "FLOAT"
 EQUAL = "=="
@@ -1,44 +1,196 @@
 import argparse
+import asyncio
+import glob
+import json
 import sys
+import time
 from pathlib import Path
-import re
 
 sys.path.insert(0, "/Users/adar/Desktop/compiler/sly/src")
 
-from parser import CPLParser
-from lexer import CPLLexer
+from pipeline import Compiler, compile_batch, read_source, write_output
+from qud_vm import QudMachine, decode
+from qud_transpiler import TranspiledMachine
+from compile_cache import CompileCache, DEFAULT_CACHE_DIR
+from compile_server import CompileServer, CompileClient, DEFAULT_SOCKET
+from profiler import CompileProfile
+from symbol_table import SymbolTable
+
+def expand_paths(arguments):
+    # every argument is a file, a directory (its .ou files) or a glob pattern
+    paths = []
+    for argument in arguments:
+        if Path(argument).is_dir():
+            paths.extend(sorted(Path(argument).glob('*.ou')))
+        elif any(character in argument for character in '*?['):
+            paths.extend(sorted(Path(match) for match in glob.glob(argument, recursive=True)))
+        else:
+            paths.append(Path(argument))
+    # a file named by more than one argument is compiled once, as it was first named
+    unique = {}
+    for path in paths:
+        unique.setdefault(path.resolve(), path)
+    return list(unique.values())
+
+BACKENDS = {'vm': QudMachine, 'python': TranspiledMachine}
+
+def run_program(program, backend='vm'):
+    machine = BACKENDS[backend](program)
+    try:
+        machine.run()
+    except Exception as e:
+        print(f"Runtime error: {e}", file=sys.stderr)
+    machine.report()
+
+def compile_one(path, args):
+    cache = CompileCache(args.cache_dir) if args.cache_dir is not None else None
+    profile = CompileProfile() if args.profile or args.profile_json else None
+    compiler = Compiler(args.optimize, args.binary, cache, profile)
+    output_file = compiler.compile_file(path)
+
+    if output_file is not None and profile is not None:
+        report_profile(profile, args)
+    if output_file is not None and args.dump_cfg:
+        print(compiler.control_flow_graph(read_source(path)))
+
+    if output_file is not None and args.run:
+        run_program(decode(output_file.read_text(), compiler.symbol_table), args.backend)
+
+def report_profile(profile, args):
+    if args.profile:
+        profile.report(sys.stderr)
+    if args.profile_json == '-':
+        print(profile.to_json())
+    elif args.profile_json:
+        Path(args.profile_json).write_text(profile.to_json())
+
+def compile_with_server(paths, args):
+    # returns False when there is no server to compile with
+    client = CompileClient(args.socket)
+    if not client.available():
+        print(f'No compile server on {args.socket}, compiling locally', file=sys.stderr)
+        return False
+
+    try:
+        for path in paths:
+            prefix = f"{path}: " if len(paths) > 1 else ""
+            source = read_source(path)
+            if source is None:
+                continue
+
+            output_code, diagnostics, declarations = client.compile(source, args.optimize)
+            for line in diagnostics.splitlines():
+                print(f"{prefix}{line}", file=sys.stderr)
+            if output_code is None:
+                continue
+
+            symbol_table = SymbolTable.from_declarations(declarations) if declarations is not None else None
+            write_output(path, output_code, args.binary, symbol_table)
+            if args.run:
+                run_program(decode(output_code, symbol_table), args.backend)
+    finally:
+        client.close()
+    return True
+
+def compile_many(paths, args):
+    start = time.perf_counter()
+    compiled = 0
+    cached = 0
+    lines = 0
+
+    for result in compile_batch(paths, args.optimize, args.binary, args.jobs, args.cache_dir):
+        lines += result.lines
+        cached += result.cached
+        for line in result.diagnostics.splitlines():
+            print(f"{result.path}: {line}", file=sys.stderr)
+        if result.ok:
+            compiled += 1
+        else:
+            print(f"{result.path}: failed", file=sys.stderr)
+
+    elapsed = time.perf_counter() - start
+    print(f"Compiled {compiled} of {len(paths)} files ({cached} from the cache), {lines} lines in {elapsed:.2f}s "
+          f"({len(paths) / elapsed:,.1f} files/s, {lines / elapsed:,.0f} lines/s)", file=sys.stderr)
 
 def main():
 
     print('Adar Agai', file=sys.stderr)
     parser = argparse.ArgumentParser(description='Compiler')
-    parser.add_argument('-f', '--file', type=Path, help='Path of file to compile', required=True)
+    parser.add_argument('-f', '--file', nargs='+', metavar='PATH',
+                        help='Files, directories or glob patterns of the .ou files to compile')
+    parser.add_argument('-O', '--optimize', type=int, nargs='?', const=1, default=0, metavar='LEVEL',
+                        help='Optimization level, -O alone means 1 (constant propagation, peephole and control '
+                             'flow simplification), 2 adds local value numbering and loop invariant code motion')
+    parser.add_argument('--run', action='store_true', help='Run the compiled program after writing it')
+    parser.add_argument('--backend', choices=list(BACKENDS), default='vm',
+                        help='How --run runs the program: vm interprets it, python translates it to Python first')
+    parser.add_argument('--binary', action='store_true', help='Also write the program in the binary .qudb format')
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help='Number of worker processes when compiling many files (default: one per CPU)')
+    parser.add_argument('--cache-dir', type=Path, default=DEFAULT_CACHE_DIR,
+                        help=f'Directory of the compile cache (default: {DEFAULT_CACHE_DIR})')
+    parser.add_argument('--no-cache', dest='cache_dir', action='store_const', const=None,
+                        help='Always compile, without reading or writing the compile cache')
+    parser.add_argument('--serve', action='store_true',
+                        help='Run a compile server with warm workers on --socket until it is shut down')
+    parser.add_argument('--server', action='store_true',
+                        help='Compile through the server on --socket, or locally when none is running')
+    parser.add_argument('--stats', action='store_true', help='Print the statistics of the server on --socket')
+    parser.add_argument('--dump-cfg', action='store_true',
+                        help='Print the control flow graph of the compiled program, after its optimization passes')
+    parser.add_argument('--profile', action='store_true',
+                        help='Report the time and peak memory of every compiler phase and counts of what it built')
+    parser.add_argument('--profile-json', metavar='PATH',
+                        help='Write the profile as JSON to PATH, - for stdout')
+    parser.add_argument('--socket', type=Path, default=DEFAULT_SOCKET,
+                        help=f'Unix socket of the compile server (default: {DEFAULT_SOCKET})')
 
     args = parser.parse_args()
-    if args.file.suffix != '.ou':
-        print('Invalid file extension', file=sys.stderr)
-        return
-
-    lexer = CPLLexer()
-    parser = CPLParser()
-
-    try:
-        data = Path(args.file).read_text()
 
-        result = parser.parse(lexer.tokenize(data))
+    if args.serve:
+        try:
+            asyncio.run(CompileServer(args.socket, args.jobs, args.cache_dir).serve())
+        except KeyboardInterrupt:
+            pass
+        except Exception as e:
+            print(f"Error: {e}", file=sys.stderr)
+        return
 
-        if parser.errors_found == True:
-            print("Errors found during parsing", file=sys.stderr)
-            return
+    if args.stats:
+        client = CompileClient(args.socket)
+        try:
+            print(json.dumps(client.stats(), indent=2))
+        except OSError:
+            print(f'No compile server on {args.socket}', file=sys.stderr)
+        finally:
+            client.close()
+        return
 
-        output_file = args.file.with_suffix('.qud')
+    if not args.file:
+        parser.error('the following arguments are required: -f/--file')
 
-        output_code = result.code + '\nHALT\n' + 'Adar Agai'
+    paths = expand_paths(args.file)
+    if args.run and len(paths) > 1:
+        print('--run takes a single input file', file=sys.stderr)
+        return
+    profiling = args.profile or args.profile_json
+    if profiling and len(paths) > 1:
+        print('--profile takes a single input file', file=sys.stderr)
+        return
+    if args.dump_cfg and len(paths) > 1:
+        print('--dump-cfg takes a single input file', file=sys.stderr)
+        return
 
-        output_file.write_text(re.sub(r"\n\s*\n", "\n", output_code).strip())
+    # a profile or a graph is taken of a local compilation
+    if args.server and not profiling and not args.dump_cfg and paths and compile_with_server(paths, args):
+        return
 
-    except FileNotFoundError as e:
-        print('Input file not found', file=sys.stderr)
+    if not paths:
+        print('No input files', file=sys.stderr)
+    elif len(paths) == 1:
+        compile_one(paths[0], args)
+    else:
+        compile_many(paths, args)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,91 @@
+import re
+import sys
+from sly.lex import Token
+
+# A hand written lexer for the CPL token set, producing the same tokens as CPLLexer for CPLParser.
+# All the token rules are one master regex, so the scanning stays inside the regex engine: every match is
+# the whitespace and comments skipped before a token, then the token itself. The matches are taken one at
+# a time with finditer, so only the token being handed to the parser is held, not every token of the text.
+# The last alternative matches any single character other than whitespace, which makes finditer never
+# skip text silently: characters that aren't the start of a token come out as illegal characters.
+# The empty match at the end of the text stops a trailing comment from being split up by backtracking.
+#
+# The token type is looked up from its text for keywords and operators, anything else is an ID or a NUM.
+# Line numbers are counted in bulk from the skipped text, including the newlines inside comments.
+
+MASTER_PATTERN = re.compile(r"""
+    ((?:[ \t\n]+|/\*.*?\*/)*)
+    (static_cast<int>|static_cast<float>
+    |[a-zA-Z_][a-zA-Z0-9_]*
+    |\d+(?:\.\d*)?
+    |==|!=|>=|<=|\|\||&&
+    |[^ \t\n]
+    |\Z)
+""", re.VERBOSE | re.DOTALL)
+
+TOKEN_TYPES = {
+    "int": "INT",
+    "float": "FLOAT",
+    "input": "INPUT",
+    "output": "OUTPUT",
+    "else": "ELSE",
+    "if": "IF",
+    "while": "WHILE",
+    "static_cast<int>": "CAST",
+    "static_cast<float>": "CAST",
+    "==": "RELOP", "!=": "RELOP", ">=": "RELOP", "<=": "RELOP", "<": "RELOP", ">": "RELOP",
+    "+": "ADDOP", "-": "ADDOP",
+    "*": "MULOP", "/": "MULOP",
+    "||": "OR",
+    "&&": "AND",
+    "!": "NOT",
+}
+# literals are their own token type
+TOKEN_TYPES.update((literal, literal) for literal in "=;(){},:")
+
+IDENTIFIER_START = "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ_"
+
+class FastCPLLexer:
+
+    def __init__(self):
+        self.lineno = 1
+
+    def tokenize(self, text, lineno=1, index=0):
+        token_types = TOKEN_TYPES
+        self.lineno = lineno
+
+        for match in MASTER_PATTERN.finditer(text, index):
+            skipped = match.group(1)
+            value = match.group(2)
+            if skipped:
+                lineno += skipped.count("\n")
+                index += len(skipped)
+
+            kind = token_types.get(value)
+            if kind is None:
+                if not value:
+                    break
+                first = value[0]
+                if first in IDENTIFIER_START:
+                    kind = "ID"
+                elif first.isdecimal():
+                    kind = "NUM"
+                else:
+                    self.lineno = lineno
+                    self.error(value)
+                    index += 1
+                    continue
+
+            token = Token()
+            token.type = kind
+            token.value = value
+            token.lineno = lineno
+            token.index = index
+            index += len(value)
+            token.end = index
+            yield token
+
+        self.lineno = lineno
+
+    def error(self, character):
+        print(f"Lexical error: illegal character {character} at line {self.lineno}", file=sys.stderr)
@@ -0,0 +1,28 @@
+class InstructionList:
+
+    # An append-only sequence of instructions. Splicing another list only stores a reference to it,
+    # so building the code of a node out of its children is O(1) no matter how much code they hold.
+    # The whole tree is flattened once, when it is iterated.
+
+    __slots__ = ("parts",)
+
+    def __init__(self):
+        self.parts = []
+
+    def append(self, instruction):
+        self.parts.append(instruction)
+
+    def extend(self, other):
+        self.parts.append(other)
+
+    def __iter__(self):
+        # iterative walk so deeply nested blocks can't hit the recursion limit
+        stack = [iter(self.parts)]
+        while stack:
+            for part in stack[-1]:
+                if isinstance(part, InstructionList):
+                    stack.append(iter(part.parts))
+                    break
+                yield part
+            else:
+                stack.pop()
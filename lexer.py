@@ -24,19 +24,15 @@ class CPLLexer(Lexer):
     literals = { '=', ';', '(', ')', '{', '}', ',', ':' }
 
     ignore = ' \t'
-    ignore_comment = r"/\*(.|\n)*?\*/"
+
+    @_(r"/\*(.|\n)*?\*/")
+    def ignore_comment(self, t):
+        self.lineno += t.value.count('\n')
 
     @_(r'\n+')
     def ignore_newline(self, t):
         self.lineno += len(t.value)
 
-    INT = r'int'
-    FLOAT = r'float'
-    INPUT = r'input'
-    OUTPUT = r'output'
-    ELSE = r'else'
-    IF = r'if'
-    WHILE = r'while'
     RELOP = r"==|!=|>=|<=|<|>"
     CAST = r'static_cast<int>|static_cast<float>'
     ADDOP = r'\+|-'
@@ -45,6 +41,14 @@ class CPLLexer(Lexer):
     AND = r'&&'
     NOT = r'!'
     ID = r'[a-zA-Z_][a-zA-Z0-9_]*'
+    # keywords are IDs with their own token type, so identifiers like "integer" stay a single ID
+    ID['int'] = INT
+    ID['float'] = FLOAT
+    ID['input'] = INPUT
+    ID['output'] = OUTPUT
+    ID['else'] = ELSE
+    ID['if'] = IF
+    ID['while'] = WHILE
     NUM = r'\d+(\.\d*)?'
 
     def __init__(self):
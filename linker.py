@@ -0,0 +1,36 @@
+from consts import LABEL, JUMP, JMPZ
+from quad import Quad, Operand, OperandKind
+
+def link(quads, base=0):
+
+    # Resolves every label to the 1-based line number of the quad that follows it and drops the label
+    # quads, in a single pass. Jumps to labels that were already seen are patched as they are emitted,
+    # forward jumps wait in a pending list until their label shows up. base is the number of lines that
+    # come before these quads in the .qud file, so a program can be linked one piece at a time.
+
+    linked = []
+    addresses = {}
+    pending = {}
+
+    for quad in quads:
+        if quad.opcode == LABEL:
+            address = Operand(OperandKind.ADDRESS, str(base + len(linked) + 1))
+            addresses[quad.arg1.name] = address
+            for index in pending.pop(quad.arg1.name, ()):
+                jump = linked[index]
+                linked[index] = Quad(jump.opcode, address, jump.arg2)
+            continue
+
+        if quad.opcode == JUMP or quad.opcode == JMPZ:
+            address = addresses.get(quad.arg1.name)
+            if address is not None:
+                quad = Quad(quad.opcode, address, quad.arg2)
+            else:
+                pending.setdefault(quad.arg1.name, []).append(len(linked))
+
+        linked.append(quad)
+
+    if pending:
+        raise Exception(f"Undefined labels: {', '.join(pending)}")
+
+    return linked
@@ -0,0 +1,252 @@
+import heapq
+import re
+from consts import *
+from quad import Quad, Operand, OperandKind
+from cfg import ControlFlowGraph, BasicBlock
+
+# Loop invariant code motion. A while loop is laid out as its header block (the condition), the body and a
+# jump back to the header, so a loop is found from a jump to an earlier block and spans the blocks from its
+# header to the last block jumping back. Only loops entered through the header alone are optimized.
+#
+# A quad computing a temp is invariant when every operand it reads is a literal, a variable no quad of the
+# loop writes (input included) or a temp computed by another invariant quad. Invariant quads move to a
+# preheader block run once before the loop. Temps are recycled within the loop, so a moved quad writes a
+# fresh temp and the quads reading its value, up to the next write of the old temp, read the fresh one. A quad that can fail at run
+# time (a division, a float to int conversion) only moves out of the header, which runs whenever the loop
+# is entered, so hoisting never makes a program fail that would not have. Inner loops go first, and what
+# they hoist can move on out of the loops around them. The preheader has a label of its own, jumps into the
+# loop from outside go there instead of to the header.
+#
+# A hoisted temp lives from its preheader to the end of its loop, so the fresh temps are allocated again
+# once every loop is done: each one takes the lowest number of its type that no temp live at the same time
+# holds, and the number of temps stays bounded by how many are live at once rather than by program size.
+
+MAY_FAIL = (IDIV, RDIV, RTOI)
+NAME_PATTERN = re.compile(r"(int|float|label)_temp_(\d+)")
+
+class FreshNames:
+
+    # temps and labels no quad uses yet, numbered on from the highest ones of the program
+
+    def __init__(self, quads):
+        self.counts = {"int": 0, "float": 0, "label": 0}
+        self.temps = []
+        for quad in quads:
+            for operand in quad.operands():
+                match = NAME_PATTERN.fullmatch(operand.name)
+                if match is not None:
+                    self.counts[match.group(1)] = max(self.counts[match.group(1)], int(match.group(2)))
+
+    def new(self, prefix, kind):
+        self.counts[prefix] += 1
+        operand = Operand(kind, f"{prefix}_temp_{self.counts[prefix]}")
+        if kind == OperandKind.TEMP:
+            self.temps.append(operand.name)
+        return operand
+
+    def like(self, temp):
+        # a temp of the same type as temp
+        return self.new(NAME_PATTERN.fullmatch(temp.name).group(1), OperandKind.TEMP)
+
+    def label(self):
+        return self.new("label", OperandKind.LABEL)
+
+def find_loops(graph):
+    # (header, last block jumping back to it) of every loop entered through its header alone, by block index
+    latches = {}
+    for block in graph.blocks:
+        for successor in block.successors:
+            if successor.index <= block.index:
+                latches[successor.index] = max(latches.get(successor.index, block.index), block.index)
+
+    loops = []
+    for start, end in latches.items():
+        body = graph.blocks[start + 1:end + 1]
+        if any(not start <= predecessor.index <= end for block in body for predecessor in block.predecessors):
+            continue
+        loops.append((start, end))
+    return loops
+
+def is_invariant(quad, written, invariant_temps, in_header):
+    target = quad.defined()
+    if target is None or target.kind != OperandKind.TEMP or quad.opcode in (IINP, RINP):
+        return False
+    if quad.opcode in MAY_FAIL and not in_header:
+        return False
+    for source in quad.used():
+        if source.kind == OperandKind.TEMP:
+            if source.name not in invariant_temps:
+                return False
+        elif not source.is_literal() and source.name in written:
+            return False
+    return True
+
+def hoist(graph, start, end, preheaders, fresh):
+    blocks = graph.blocks[start:end + 1]
+    written = set()
+    for block in blocks:
+        for quad in preheaders.get(block.index, []) + block.quads:
+            target = quad.defined()
+            if target is not None and target.kind == OperandKind.VARIABLE:
+                written.add(target.name)
+
+    hoisted = []
+    invariant_temps = set()
+    for block in blocks:
+        # the temps of an inner loop's preheader are fresh already, they keep their names
+        preheader = preheaders.get(block.index)
+        if preheader:
+            preheader[:] = hoist_from(preheader, hoisted, written, invariant_temps, False, None)
+        block.quads = hoist_from(block.quads, hoisted, written, invariant_temps, block.index == start, fresh)
+    if hoisted:
+        preheaders[start] = hoisted + preheaders.get(start, [])
+
+def hoist_from(quads, hoisted, written, invariant_temps, in_header, fresh):
+    # the quads that stay, the invariant ones are appended to hoisted, renamed to fresh temps unless fresh is None
+    kept = []
+    renamed = {}
+    for quad in quads:
+        if renamed and any(source.name in renamed for source in quad.used()):
+            quad = quad.replace_used(lambda operand: renamed.get(operand.name, operand))
+
+        if is_invariant(quad, written, invariant_temps, in_header):
+            if fresh is not None:
+                temp = fresh.like(quad.arg1)
+                renamed[quad.arg1.name] = temp
+                quad = Quad(quad.opcode, temp, quad.arg2, quad.arg3)
+            invariant_temps.add(quad.arg1.name)
+            hoisted.append(quad)
+            continue
+
+        target = quad.defined()
+        if target is not None:
+            renamed.pop(target.name, None)
+        kept.append(quad)
+    return kept
+
+def hoist_loop_invariants(quads):
+    graph = ControlFlowGraph.from_quads(quads)
+    loops = find_loops(graph)
+    if not loops:
+        return quads
+
+    # the hoisted quads of each loop, by the index of its header
+    preheaders = {}
+    fresh = FreshNames(quads)
+    for start, end in sorted(loops, key=lambda loop: loop[1] - loop[0]):
+        hoist(graph, start, end, preheaders, fresh)
+    if not preheaders:
+        return quads
+
+    ends = dict(loops)
+    blocks = []
+    for block in graph.blocks:
+        hoisted = preheaders.get(block.index)
+        if hoisted:
+            preheader = BasicBlock(len(blocks))
+            preheader.labels.append(fresh.label())
+            preheader.quads = hoisted
+            enter_through(preheader, block, ends[block.index])
+            blocks.append(preheader)
+        blocks.append(block)
+    graph = ControlFlowGraph(blocks)
+    reallocate_temps(graph, set(fresh.temps))
+    return graph.to_quads()
+
+def enter_through(preheader, header, end):
+    # the jumps to the header from outside its loop, the back edges keep going to the header
+    for predecessor in header.predecessors:
+        jump = predecessor.jump()
+        if header.index <= predecessor.index <= end or jump is None:
+            continue
+        if any(label.name == jump.arg1.name for label in header.labels):
+            predecessor.quads[-1] = Quad(jump.opcode, preheader.labels[0], jump.arg2)
+
+def live_ranges(blocks, temps):
+    # the first and last position, counting quads in block order, at which each of temps is live
+    uses = []
+    defines = []
+    for block in blocks:
+        used = set()
+        defined = set()
+        for quad in block.quads:
+            used.update(source.name for source in quad.used() if source.name in temps and source.name not in defined)
+            target = quad.defined()
+            if target is not None and target.name in temps:
+                defined.add(target.name)
+        uses.append(used)
+        defines.append(defined)
+
+    live_in = [set(used) for used in uses]
+    live_out = [set() for _ in blocks]
+    changed = True
+    while changed:
+        changed = False
+        for block in reversed(blocks):
+            index = block.index
+            out = set().union(*(live_in[successor.index] for successor in block.successors))
+            if out != live_out[index]:
+                live_out[index] = out
+                live_in[index] = uses[index] | (out - defines[index])
+                changed = True
+
+    ranges = {}
+
+    def extend(name, position):
+        start, end = ranges.get(name, (position, position))
+        ranges[name] = (min(start, position), max(end, position))
+
+    position = 0
+    for block in blocks:
+        first = position
+        for name in live_in[block.index]:
+            extend(name, first)
+        for quad in block.quads:
+            for operand in quad.operands():
+                if operand.name in temps:
+                    extend(operand.name, position)
+            position += 1
+        for name in live_out[block.index]:
+            extend(name, max(first, position - 1))
+    return ranges
+
+def reallocate_temps(graph, temps):
+    # renames temps, in place, to the lowest numbers free over their live ranges, clear of every other temp
+    if not temps:
+        return
+    taken = {operand.name for block in graph.blocks for quad in block.quads for operand in quad.operands()
+             if operand.kind == OperandKind.TEMP and operand.name not in temps}
+    free = {"int": [], "float": []}
+    counts = {"int": 0, "float": 0}
+
+    def allocate(kind):
+        if free[kind]:
+            return heapq.heappop(free[kind])
+        counts[kind] += 1
+        while f"{kind}_temp_{counts[kind]}" in taken:
+            counts[kind] += 1
+        return counts[kind]
+
+    names = {}
+    # (end, type, number) of the temps given a number, the one whose range ends first on top
+    active = []
+    ranges = live_ranges(graph.blocks, temps)
+    for name, (start, end) in sorted(ranges.items(), key=lambda item: item[1]):
+        while active and active[0][0] < start:
+            _, kind, number = heapq.heappop(active)
+            heapq.heappush(free[kind], number)
+        kind = NAME_PATTERN.fullmatch(name).group(1)
+        number = allocate(kind)
+        names[name] = Operand(OperandKind.TEMP, f"{kind}_temp_{number}")
+        heapq.heappush(active, (end, kind, number))
+
+    for block in graph.blocks:
+        renamed = []
+        for quad in block.quads:
+            if any(operand.name in names for operand in quad.operands()):
+                quad = quad.replace_used(lambda operand: names.get(operand.name, operand))
+                target = quad.defined()
+                if target is not None and target.name in names:
+                    quad = Quad(quad.opcode, names[target.name], quad.arg2, quad.arg3)
+            renamed.append(quad)
+        block.quads = renamed
@@ -0,0 +1,30 @@
+from constant_folding import propagate_constants
+from peephole import peephole
+from cfg import simplify_cfg
+from loop_invariant import hoist_loop_invariants
+from value_numbering import number_values
+
+# Optimization passes over the quads of a whole program, before labels are resolved.
+# Each entry is the lowest optimization level (cpq.py -O) that runs the pass. The peephole pass counts on
+# every temp being read once, as the code generator writes them, so it runs before value numbering.
+
+PASSES = [
+    (1, propagate_constants),
+    (1, peephole),
+    (1, simplify_cfg),
+    (2, number_values),
+    (2, hoist_loop_invariants),
+    (2, simplify_cfg),
+]
+
+def optimize(quads, level, profile=None):
+    # with a CompileProfile every pass is timed as a phase of its own
+    for min_level, optimization_pass in PASSES:
+        if level < min_level:
+            continue
+        if profile is None:
+            quads = optimization_pass(quads)
+        else:
+            with profile.phase(f"optimize: {optimization_pass.__name__}"):
+                quads = optimization_pass(quads)
+    return quads
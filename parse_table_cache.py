@@ -0,0 +1,57 @@
+import hashlib
+import os
+import pickle
+import sly
+
+# SLY rebuilds the LALR tables of a parser every time its class is created, that is once per process.
+# The tables only depend on the grammar, so they are pickled next to the bytecode cache, keyed by a hash
+# of the productions, and reused by every later process until the grammar changes.
+
+CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "__pycache__", "cpl_parsetab.pickle")
+
+class CachedTables:
+
+    # stands in for sly's LRTable, with only the tables Parser.parse reads
+
+    def __init__(self, lr_action, lr_goto, defaulted_states):
+        self.lr_action = lr_action
+        self.lr_goto = lr_goto
+        self.defaulted_states = defaulted_states
+
+def grammar_key(grammar):
+    digest = hashlib.sha256()
+    digest.update(sly.__version__.encode())
+    # production numbers are baked into the tables, so the order matters as much as the rules themselves
+    for production in grammar.Productions:
+        digest.update(f"{production}\n".encode())
+    digest.update(repr(sorted(grammar.Precedence.items())).encode())
+    digest.update(str(grammar.Start).encode())
+    return digest.hexdigest()
+
+def load_tables(key, path=CACHE_PATH):
+    try:
+        with open(path, "rb") as cache:
+            cached = pickle.load(cache)
+        if cached["key"] != key:
+            return None
+        return CachedTables(cached["action"], cached["goto"], cached["defaulted_states"])
+    except (OSError, EOFError, pickle.UnpicklingError, KeyError, TypeError):
+        return None
+
+def store_tables(key, lrtable, path=CACHE_PATH):
+    cached = {
+        "key": key,
+        "action": lrtable.lr_action,
+        "goto": lrtable.lr_goto,
+        "defaulted_states": lrtable.defaulted_states,
+    }
+    # written to a temporary file and renamed, so processes starting at the same time never read half a file
+    temporary_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(temporary_path, "wb") as cache:
+            pickle.dump(cached, cache, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary_path, path)
+    except OSError:
+        # a read-only checkout just means every run builds the tables itself
+        pass
@@ -5,6 +5,9 @@ from quad_generator import QuadGenerator
 import sys
 from quad_result import QuadResult 
 from consts import INT, FLOAT
+from quad import OperandKind
+from sly.yacc import YaccError
+from parse_table_cache import grammar_key, load_tables, store_tables
 
 class CPLParser(Parser):
 
@@ -12,22 +15,61 @@ class CPLParser(Parser):
 
     tokens = CPLLexer.tokens
 
-    def __init__(self):
+    @classmethod
+    def _build(cls, definitions):
+        # The same steps as sly's Parser._build, except that the LALR tables are read from the parse table
+        # cache when the grammar hasn't changed since they were last built.
+        rules = cls._Parser__collect_rules(definitions)
+        if not cls._Parser__validate_specification():
+            raise YaccError('Invalid parser specification')
+        cls._Parser__build_grammar(rules)
+
+        key = grammar_key(cls._grammar)
+        tables = load_tables(key)
+        if tables is None:
+            cls._Parser__build_lrtables()
+            store_tables(key, cls._lrtable)
+        else:
+            cls._lrtable = tables
+
+    def __init__(self, optimize=False, sink=None):
+        self.optimize = optimize
+        # when set, every top level statement is passed to sink.write as soon as it is parsed instead of
+        # being collected into the code of the program
+        self.sink = sink
+        self.reset()
+
+    def reset(self):
+        # the per program state, so one parser can compile many programs one after the other
         self.symbol_table = SymbolTable()
         self.errors_found = False
-        self.quad_generator = QuadGenerator(symbol_table=self.symbol_table)
+        self.quad_generator = QuadGenerator(symbol_table=self.symbol_table, optimize=self.optimize)
 
-    @_('declarations stmt_block')
+    @_('declarations "{" program_stmts "}"')
     def program(self, p):
-        return QuadResult(p.declarations.code + p.stmt_block.code)
+        return p.program_stmts
+
+    @_('program_stmts stmt')
+    def program_stmts(self, p):
+        if self.sink is None:
+            p.program_stmts.code.extend(p.stmt.code)
+        elif not self.errors_found:
+            # a program with errors is never written, so there is no point handing over more of it
+            self.sink.write(p.stmt.code)
+        return p.program_stmts
+
+    @_('')
+    def program_stmts(self, p):
+        return QuadResult()
 
     @_('declarations declaration')
     def declarations(self, p):
-        return QuadResult(p.declarations.code + p.declaration.code)
+        # a declaration generates no code, the list is passed along as it is
+        return p.declarations
 
     @_('')
     def declarations(self, p):
-        return QuadResult("")
+        return QuadResult()
 
     @_('idlist ":" type ";"')
     def declaration(self, p):
@@ -36,7 +78,7 @@ class CPLParser(Parser):
                 print(f"Error: Variable '{var}' redeclared on line {p.lineno}.", file=sys.stderr)
                 self.errors_found = True
             self.symbol_table.add(var, p.type)
-        return QuadResult("") 
+        return QuadResult() 
 
     @_('INT')
     def type(self, p):
@@ -48,7 +90,8 @@ class CPLParser(Parser):
 
     @_('idlist "," ID')
     def idlist(self, p):
-        return p.idlist + [p.ID] # return a list of IDs so we can iterate over them
+        p.idlist.append(p.ID) # return a list of IDs so we can iterate over them
+        return p.idlist
 
     @_('ID')
     def idlist(self, p):
@@ -60,95 +103,102 @@ class CPLParser(Parser):
 
     @_('ID "=" expression ";"')
     def assignment_stmt(self, p):
-        if not self.symbol_table.contains(p.ID):
+        variable_id = self.symbol_table.id_of(p.ID)
+        if variable_id is None:
             print(f"Error: Variable '{p.ID}' not declared.", file=sys.stderr)
             self.errors_found = True
+        if p.expression.value is None:
+            self.errors_found = True
+            return QuadResult()
         try:
-            return self.quad_generator.generate_assignment(p)
+            return self.quad_generator.generate_assignment(p, variable_id)
         except Exception:
             self.errors_found = True
-            return QuadResult("")
+            return QuadResult()
 
     @_('INPUT "(" ID ")" ";"')
     def input_stmt(self, p):
-        if not self.symbol_table.contains(p.ID):
+        variable_id = self.symbol_table.id_of(p.ID)
+        if variable_id is None:
             print(f"Error: Variable '{p.ID}' not declared.", file=sys.stderr)
             self.errors_found = True
-        return self.quad_generator.generate_input(p)
+        return self.quad_generator.generate_input(p, variable_id)
 
     @_('OUTPUT "(" expression ")" ";"')
     def output_stmt(self, p):
         if p.expression.value is None:
             self.errors_found = True
-            return QuadResult("")
+            return QuadResult()
         return self.quad_generator.generate_output(p)
 
     @_('IF "(" boolexpr ")" stmt ELSE stmt')
     def if_stmt(self, p):
-        if p.boolexpr.value is None:
+        if not p.boolexpr.is_condition():
             self.errors_found = True
-            return QuadResult("")
+            return QuadResult()
         return self.quad_generator.generate_if(p, p.stmt0.code, p.stmt1.code) 
 
     @_('WHILE "(" boolexpr ")" stmt')      
     def while_stmt(self, p):
-        if p.boolexpr.value is None:
+        if not p.boolexpr.is_condition():
             self.errors_found = True
-            return QuadResult("")
+            return QuadResult()
         return self.quad_generator.generate_while(p)
 
     @_('"{" stmtlist "}"')
     def stmt_block(self, p):
         return QuadResult(p.stmtlist.code)
 
-    @_('stmt stmtlist')
+    @_('stmtlist stmt')
     def stmtlist(self, p):
-        return QuadResult(p.stmt.code + "\n" + p.stmtlist.code)
+        # left recursive like program_stmts, each statement is reduced and appended as soon as it is parsed
+        p.stmtlist.code.extend(p.stmt.code)
+        return p.stmtlist
 
     @_('')
     def stmtlist(self, p):
-        return QuadResult("")
+        return QuadResult()
 
     @_('boolexpr OR boolterm')
     def boolexpr(self, p):
-        if p.boolexpr.value is None or p.boolterm.value is None:
+        if not p.boolexpr.is_condition() or not p.boolterm.is_condition():
             self.errors_found = True
-            return QuadResult("")
+            return QuadResult()
         return self.quad_generator.generate_or(p)
 
     @_('boolterm')
     def boolexpr(self, p):
-        if p.boolterm.value is None:
+        if not p.boolterm.is_condition():
             self.errors_found = True
-            return QuadResult("")
+            return QuadResult()
         return p.boolterm
 
     @_('boolterm AND boolfactor')
     def boolterm(self, p):
-        if p.boolterm.value is None or p.boolfactor.value is None:
+        if not p.boolterm.is_condition() or not p.boolfactor.is_condition():
             self.errors_found = True
-            return QuadResult("")
+            return QuadResult()
         return self.quad_generator.generate_and(p)
 
     @_('boolfactor')
     def boolterm(self, p):
-        if p.boolfactor.value is None:
+        if not p.boolfactor.is_condition():
             self.errors_found = True
-            return QuadResult("")
+            return QuadResult()
         return p.boolfactor
 
     @_('NOT "(" boolexpr ")"')
     def boolfactor(self, p):
-        if p.boolexpr.value is None:
+        if not p.boolexpr.is_condition():
             self.errors_found = True
-            return QuadResult("")
+            return QuadResult()
         return self.quad_generator.generate_not(p)
 
     @_('expression RELOP expression')
     def boolfactor(self, p):
         if p.expression0.value is None or p.expression1.value is None:
             self.errors_found = True
-            return QuadResult("")
+            return QuadResult()
         result = self.quad_generator.generate_relop(p) 
         return result   
 
@@ -156,68 +206,72 @@ class CPLParser(Parser):
     def expression(self, p):
         if p.expression.value is None or p.term.value is None:
             self.errors_found = True
-            return QuadResult("")
+            return QuadResult()
         try:
             return self.quad_generator.generate_expression(p)
         except Exception as e:
             print(e)
             self.errors_found = True
-            return QuadResult("")
+            return QuadResult()
 
     @_('term')
     def expression(self, p):
         if p.term.value is None:
             self.errors_found = True
-            return QuadResult("")
+            return QuadResult()
         return p.term
 
     @_('term MULOP factor')
     def term(self, p):
         if p.term.value is None or p.factor.value is None:
             self.errors_found = True
-            return QuadResult("")
+            return QuadResult()
         try:
             return self.quad_generator.generate_term(p)
         except Exception as e:
             print(e)
             self.errors_found = True
-            return QuadResult("")
+            return QuadResult()
 
     @_('factor')
     def term(self, p):
         if p.factor.value is None:
             self.errors_found = True
-            return QuadResult("")
+            return QuadResult()
         return p.factor
 
     @_('"(" expression ")"')
     def factor(self, p):
         if p.expression.value is None:
             self.errors_found = True
-            return QuadResult("")
+            return QuadResult()
         return p.expression
 
     @_('CAST "(" expression ")"')  
     def factor(self, p):
         if p.expression.value is None:
             self.errors_found = True
-            return QuadResult("")
+            return QuadResult()
         try:
             return self.quad_generator.generate_cast(p)  
         except Exception:
             self.errors_found = True
-            return QuadResult("")
+            return QuadResult()
 
     @_('ID')
     def factor(self, p):
-        if not self.symbol_table.contains(p.ID):
+        variable_id = self.symbol_table.id_of(p.ID)
+        if variable_id is None:
             print(f"Error: Variable '{p.ID}' not declared.", file=sys.stderr)
             self.errors_found = True
-        return QuadResult("", p.ID)
+            return QuadResult()
+        return QuadResult(value=p.ID, type=self.symbol_table.type_of(variable_id), kind=OperandKind.VARIABLE)
 
     @_('NUM')
     def factor(self, p):
-        return QuadResult("", p.NUM)
+        if "." in p.NUM:
+            return QuadResult(value=p.NUM, type=FLOAT, kind=OperandKind.FLOAT_LITERAL)
+        return QuadResult(value=p.NUM, type=INT, kind=OperandKind.INT_LITERAL)
 
     def error(self, p):
         if not p:
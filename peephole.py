@@ -0,0 +1,104 @@
+from consts import *
+from quad import Quad, OperandKind
+from constant_folding import fold, assignment_for, remove_dead_temps
+
+# Peephole optimization over a window of adjacent quads, before labels are resolved. It relies on the code
+# generator's guarantee that the value written to a temp is read by exactly one quad, so a temp that is
+# written and read by the next quad is not needed anywhere else.
+#
+# - a conversion of a literal becomes an assignment of the converted literal
+# - a temp assigned a literal and read by the next quad is replaced by the literal
+# - a quad writing a temp that the next quad copies to a variable writes the variable directly
+# - a jump to a label that directly follows it is removed, as is a JMPZ followed by a JUMP to its target
+# - a jump to a label followed by a JUMP goes straight to the end of the chain
+# - labels no jump refers to are removed
+
+ASSIGNMENTS = (IASN, RASN)
+
+def peephole(quads):
+    quads = thread_jumps(list(quads))
+
+    window = []
+    for quad in quads:
+        if (quad.opcode == ITOR or quad.opcode == RTOI) and quad.arg2.is_literal():
+            literal = fold(quad.opcode, quad.arg2)
+            if literal is not None:
+                quad = Quad(assignment_for(literal), quad.arg1, literal)
+
+        if quad.opcode == LABEL:
+            remove_jumps_to(window, quad.arg1.name)
+        window.append(quad)
+        combine(window)
+
+    return remove_dead_temps(remove_dead_labels(window))
+
+def is_temp_literal(quad):
+    return quad.opcode in ASSIGNMENTS and quad.arg1.kind == OperandKind.TEMP and quad.arg2.is_literal()
+
+def combine(window):
+    # merges the last quad of the window into the one before it for as long as a pattern applies
+    while len(window) >= 2:
+        previous, last = window[-2], window[-1]
+        if previous.opcode == LABEL:
+            return
+
+        if is_temp_literal(previous) and any(source.name == previous.arg1.name for source in last.used()):
+            temp, literal = previous.arg1.name, previous.arg2
+            window[-2:] = [last.replace_used(lambda operand: literal if operand.name == temp else operand)]
+            continue
+
+        if (last.opcode in ASSIGNMENTS and last.arg2.kind == OperandKind.TEMP
+                and previous.defined() is not None and previous.defined().name == last.arg2.name):
+            window[-2:] = [Quad(previous.opcode, last.arg1, previous.arg2, previous.arg3)]
+            continue
+
+        if previous.opcode == JMPZ and last.opcode == JUMP and previous.arg1.name == last.arg1.name:
+            window[-2:] = [last]
+            continue
+        return
+
+def remove_jumps_to(window, label):
+    # the jumps right before label, with only other labels in between, fall through to it anyway
+    index = len(window) - 1
+    while index >= 0:
+        quad = window[index]
+        if quad.opcode == LABEL:
+            index -= 1
+        elif quad.is_jump() and quad.arg1.name == label:
+            del window[index]
+            index -= 1
+        else:
+            return
+
+def thread_jumps(quads):
+    # where a jump to each label really ends up, following labels that are directly followed by a JUMP
+    forwards = {}
+    for index, quad in enumerate(quads):
+        if quad.opcode != LABEL:
+            continue
+        following = index + 1
+        while following < len(quads) and quads[following].opcode == LABEL:
+            following += 1
+        if following < len(quads) and quads[following].opcode == JUMP:
+            forwards[quad.arg1.name] = quads[following].arg1
+
+    if not forwards:
+        return quads
+
+    def destination(label):
+        seen = set()
+        while label.name in forwards and label.name not in seen:
+            seen.add(label.name)
+            label = forwards[label.name]
+        return label
+
+    threaded = []
+    for quad in quads:
+        if quad.is_jump() and quad.arg1.name in forwards:
+            quad = Quad(quad.opcode, destination(quad.arg1), quad.arg2)
+        threaded.append(quad)
+    return threaded
+
+def remove_dead_labels(quads):
+    targets = {quad.arg1.name for quad in quads if quad.is_jump()}
+    return [quad for quad in quads if quad.opcode != LABEL or quad.arg1.name in targets]
@@ -0,0 +1,268 @@
+import io
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stderr, redirect_stdout
+from pathlib import Path
+
+from parser import CPLParser
+from fast_lexer import FastCPLLexer
+from qud_writer import QudWriter
+from optimizer import optimize
+from consts import LABEL
+from cfg import ControlFlowGraph
+from qud_vm import decode
+from qud_binary import write_binary, binary_path
+from compile_cache import CompileCache
+from symbol_table import SymbolTable
+from profiler import trace_memory, count_reductions
+
+# The compiler pipeline from a .ou file to its .qud file, shared by cpq.py for a single file, the batch
+# workers and the compile server. A Compiler keeps one lexer and parser and only resets the per program
+# state between files. The .qud file is written while the program is parsed, to a temporary file that
+# replaces the .qud file once the whole program compiled. With a compile cache, sources that were compiled
+# before with the same options are not compiled again. symbol_table is the table of the last program that
+# compiled, rebuilt from the cache entry on a hit, so decoding its .qud file gives every declared variable
+# its slot and type. With a CompileProfile the phases run one after another and are timed, the cache is
+# not used then.
+
+OUTPUT_BUFFER_SIZE = 1 << 16
+
+def read_source(path):
+    # the text of a .ou file, or None after reporting why it can't be compiled
+    path = Path(path)
+    if path.suffix != '.ou':
+        print('Invalid file extension', file=sys.stderr)
+        return None
+
+    try:
+        return path.read_text()
+    except FileNotFoundError:
+        print('Input file not found', file=sys.stderr)
+        return None
+
+def output_path(path):
+    return Path(path).with_suffix('.qud')
+
+def write_output(path, output_code, binary=False, symbol_table=None):
+    output_file = output_path(path)
+    output_file.write_text(output_code)
+    if binary:
+        write_binary(decode(output_code, symbol_table), binary_path(output_file))
+
+class Compiler:
+
+    def __init__(self, level=0, binary=False, cache=None, profile=None):
+        self.level = level
+        self.binary = binary
+        self.cache = cache
+        self.profile = profile
+        self.lexer = FastCPLLexer()
+        self.parser = CPLParser(optimize=level > 0)
+        self.lines_compiled = 0
+        self.cache_hits = 0
+        self.symbol_table = None
+
+    def compile_to(self, source, stream):
+        # writes the .qud text to stream, returns False when the program has errors (they are reported on
+        # stderr), in which case what was written so far is not a program
+        writer = QudWriter(stream, self.level)
+        self.symbol_table = None
+        self.parser.reset()
+        self.parser.sink = writer
+        try:
+            self.parser.parse(self.lexer.tokenize(source))
+        finally:
+            self.parser.sink = None
+
+        if self.parser.errors_found:
+            print("Errors found during parsing", file=sys.stderr)
+            return False
+
+        writer.close()
+        self.symbol_table = self.parser.symbol_table
+        return True
+
+    def compile_profiled(self, source, stream):
+        # the same output as compile_to, written once the whole program is compiled
+        profile = self.profile
+        self.symbol_table = None
+        with trace_memory():
+            with profile.phase("lex"):
+                tokens = list(self.lexer.tokenize(source))
+
+            self.parser.reset()
+            with profile.phase("parse and codegen"), count_reductions(type(self.parser)) as reductions:
+                result = self.parser.parse(iter(tokens))
+            if self.parser.errors_found:
+                print("Errors found during parsing", file=sys.stderr)
+                return False
+
+            quads = list(result.code)
+            generator = self.parser.quad_generator
+            profile.count("tokens", len(tokens))
+            profile.count("reductions", reductions[0])
+            profile.count("quads_generated", sum(1 for quad in quads if quad.opcode != LABEL))
+            profile.count("labels", generator.temp_label_count)
+            profile.count("int_temps", generator.temp_int_count)
+            profile.count("float_temps", generator.temp_float_count)
+
+            if self.level:
+                quads = optimize(quads, self.level, profile)
+
+            with profile.phase("write"):
+                writer = QudWriter(stream)
+                writer.write(quads)
+                writer.close()
+            profile.count("quads_emitted", writer.lines)
+            profile.count_opcodes(quad for quad in quads if quad.opcode != LABEL)
+            profile.opcodes["HALT"] += 1
+
+        self.symbol_table = self.parser.symbol_table
+        return True
+
+    def control_flow_graph(self, source):
+        # the graph of the program's quads after the optimization passes of the level, None on errors
+        self.parser.reset()
+        result = self.parser.parse(self.lexer.tokenize(source))
+        if self.parser.errors_found:
+            return None
+        return ControlFlowGraph.from_quads(optimize(list(result.code), self.level))
+
+    def compile_source(self, source):
+        # the .qud text, or None when the program has errors
+        output = io.StringIO()
+        return output.getvalue() if self.compile_to(source, output) else None
+
+    def compile_to_file(self, source, output_file):
+        temporary_path = output_file.with_name(f"{output_file.name}.{os.getpid()}.tmp")
+        compile_to = self.compile_to if self.profile is None else self.compile_profiled
+        try:
+            with open(temporary_path, "w", buffering=OUTPUT_BUFFER_SIZE) as output:
+                ok = compile_to(source, output)
+            if ok:
+                os.replace(temporary_path, output_file)
+            return ok
+        finally:
+            # a program with errors leaves the .qud file of its last successful compilation alone
+            temporary_path.unlink(missing_ok=True)
+
+    def compile_text(self, source):
+        # compile_source through the cache, if there is one
+        self.lines_compiled += source.count("\n") + 1
+        if self.cache is None:
+            return self.compile_source(source)
+
+        return self.through_cache(source, lambda: self.compile_source(source), self.cache.put_text,
+                                  lambda entry: entry.read_output())
+
+    def compile_file(self, path):
+        # writes the .qud file (and the .qudb file) next to the source, returns the .qud path or None
+        source = read_source(path)
+        if source is None:
+            return None
+
+        self.lines_compiled += source.count("\n") + 1
+        output_file = output_path(path)
+        if self.cache is None or self.profile is not None:
+            ok = self.compile_to_file(source, output_file)
+        else:
+            ok = self.compile_file_cached(source, output_file)
+
+        if not ok:
+            return None
+        if self.binary:
+            if self.profile is None:
+                self.write_binary_file(output_file)
+            else:
+                with trace_memory(), self.profile.phase("write binary"):
+                    self.write_binary_file(output_file)
+        return output_file
+
+    def write_binary_file(self, output_file):
+        write_binary(decode(output_file.read_text(), self.symbol_table), binary_path(output_file))
+
+    def compile_file_cached(self, source, output_file):
+
+        def store(key, ok, diagnostics, declarations):
+            self.cache.put_file(key, output_file if ok else None, diagnostics, declarations)
+
+        def replay(entry):
+            if entry.output_path is None:
+                return False
+            temporary_path = output_file.with_name(f"{output_file.name}.{os.getpid()}.tmp")
+            shutil.copyfile(entry.output_path, temporary_path)
+            os.replace(temporary_path, output_file)
+            return True
+
+        return self.through_cache(source, lambda: self.compile_to_file(source, output_file), store, replay)
+
+    def through_cache(self, source, compile, store, replay):
+        # The cache handling shared by compile_text and compile_file_cached. On a miss compile() runs with
+        # what it prints captured, and store(key, result, diagnostics, declarations) adds the result to the
+        # cache. On a hit replay(entry) produces the result from the entry instead.
+        key = self.cache.key(source, self.level)
+        entry = self.cache.get(key)
+        if entry is not None:
+            self.cache_hits += 1
+            # a cache hit reports the same diagnostics as the compilation it saved
+            sys.stderr.write(entry.diagnostics)
+            self.symbol_table = self.cached_symbol_table(entry)
+            return replay(entry)
+
+        diagnostics = io.StringIO()
+        with redirect_stderr(diagnostics), redirect_stdout(diagnostics):
+            result = compile()
+        store(key, result, diagnostics.getvalue(), self.declarations())
+        sys.stderr.write(diagnostics.getvalue())
+        return result
+
+    def declarations(self):
+        return self.symbol_table.declarations() if self.symbol_table is not None else None
+
+    def cached_symbol_table(self, entry):
+        if entry.declarations is None:
+            return None
+        return SymbolTable.from_declarations(entry.declarations)
+
+class FileResult:
+
+    # what a batch worker sends back for one file, the diagnostics are everything it printed
+
+    def __init__(self, path, ok, diagnostics, lines, elapsed, cached):
+        self.path = path
+        self.ok = ok
+        self.diagnostics = diagnostics
+        self.lines = lines
+        self.elapsed = elapsed
+        self.cached = cached
+
+# the Compiler of a batch worker process, created once by its initializer and kept warm between files
+worker_compiler = None
+
+def start_worker(level, binary, cache_dir):
+    global worker_compiler
+    worker_compiler = Compiler(level, binary, CompileCache(cache_dir) if cache_dir is not None else None)
+
+def compile_in_worker(path):
+    diagnostics = io.StringIO()
+    lines = worker_compiler.lines_compiled
+    hits = worker_compiler.cache_hits
+    start = time.perf_counter()
+    with redirect_stderr(diagnostics), redirect_stdout(diagnostics):
+        try:
+            ok = worker_compiler.compile_file(path) is not None
+        except Exception as e:
+            print(f"Error: {e}", file=sys.stderr)
+            ok = False
+    return FileResult(path, ok, diagnostics.getvalue(), worker_compiler.lines_compiled - lines,
+                      time.perf_counter() - start, worker_compiler.cache_hits > hits)
+
+def compile_batch(paths, level=0, binary=False, jobs=None, cache_dir=None):
+    # compiles the files across a pool of worker processes, yields a FileResult per file in the given order
+    workers = jobs or os.cpu_count() or 1
+    chunksize = max(1, len(paths) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers, initializer=start_worker, initargs=(level, binary, cache_dir)) as executor:
+        yield from executor.map(compile_in_worker, paths, chunksize=chunksize)
@@ -0,0 +1,101 @@
+import json
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+
+# Phase timings and counters of one compilation, for cpq.py --profile. Nothing here runs unless a profile
+# is asked for: the profiled compilation (Compiler.compile_profiled) runs the phases one after another
+# instead of streaming them into each other, so each one can be timed on its own, and only then is
+# tracemalloc started. tracemalloc slows allocation down, so the times are a little higher than those of a
+# plain compilation, their proportions are what matters.
+
+class CompileProfile:
+
+    def __init__(self):
+        # a list of (name, seconds, peak bytes allocated during the phase)
+        self.phases = []
+        self.counts = {}
+        self.opcodes = Counter()
+
+    @contextmanager
+    def phase(self, name):
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.reset_peak()
+            start_memory = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1] - start_memory if tracing else None
+            self.phases.append((name, elapsed, peak))
+
+    def count(self, name, value):
+        self.counts[name] = value
+
+    def count_opcodes(self, quads):
+        self.opcodes.update(quad.opcode.name for quad in quads)
+
+    def total_time(self):
+        return sum(elapsed for _, elapsed, _ in self.phases)
+
+    def to_dict(self):
+        return {
+            "phases": [{"name": name, "seconds": elapsed, "peak_bytes": peak} for name, elapsed, peak in self.phases],
+            "total_seconds": self.total_time(),
+            "counts": self.counts,
+            "opcodes": dict(self.opcodes.most_common()),
+        }
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), indent=2)
+
+    def report(self, stream):
+        total = self.total_time()
+        print(f"{'phase':<32}{'time (ms)':>12}{'share':>8}{'peak memory':>14}", file=stream)
+        for name, elapsed, peak in self.phases:
+            share = elapsed / total * 100 if total else 0.0
+            memory = f"{peak / 1024:,.0f} KB" if peak is not None else "-"
+            print(f"{name:<32}{elapsed * 1000:>12.2f}{share:>7.1f}%{memory:>14}", file=stream)
+        print(f"{'total':<32}{total * 1000:>12.2f}", file=stream)
+
+        for name, value in self.counts.items():
+            print(f"{name.replace('_', ' '):<32}{value:>12,}", file=stream)
+        for opcode, count in self.opcodes.most_common():
+            print(f"  {opcode:<30}{count:>12,}", file=stream)
+
+@contextmanager
+def trace_memory():
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    try:
+        yield
+    finally:
+        if started:
+            tracemalloc.stop()
+
+@contextmanager
+def count_reductions(parser_class):
+    # Counts the grammar reductions of a parse by wrapping the function of every production for its duration,
+    # sly calls Production.func on each reduction and has no hook of its own. The count is a one element list.
+    reductions = [0]
+    productions = [production for production in parser_class._grammar.Productions if production is not None]
+    functions = [production.func for production in productions]
+
+    def counting(func):
+        def counted(parser, p):
+            reductions[0] += 1
+            return func(parser, p)
+        return counted
+
+    for production, func in zip(productions, functions):
+        if func is not None:
+            production.func = counting(func)
+    try:
+        yield reductions
+    finally:
+        for production, func in zip(productions, functions):
+            production.func = func
@@ -0,0 +1,106 @@
+from enum import IntEnum
+from consts import Opcode
+
+# opcodes whose first operand is the variable they write
+DEFINING_OPCODES = frozenset((
+    Opcode.IASN, Opcode.IINP, Opcode.IEQL, Opcode.INQL, Opcode.ILSS, Opcode.IGRT,
+    Opcode.IADD, Opcode.ISUB, Opcode.IMLT, Opcode.IDIV,
+    Opcode.RASN, Opcode.RINP, Opcode.REQL, Opcode.RNQL, Opcode.RLSS, Opcode.RGRT,
+    Opcode.RADD, Opcode.RSUB, Opcode.RMLT, Opcode.RDIV,
+    Opcode.ITOR, Opcode.RTOI,
+))
+
+class OperandKind(IntEnum):
+    VARIABLE = 0
+    TEMP = 1
+    INT_LITERAL = 2
+    FLOAT_LITERAL = 3
+    LABEL = 4
+    ADDRESS = 5 # a label resolved to a line number of the .qud file
+
+class Operand:
+
+    # Operands are immutable, so the same object can be shared by every quad that refers to it
+
+    __slots__ = ("kind", "name")
+
+    def __init__(self, kind, name):
+        self.kind = kind
+        self.name = name
+
+    def is_literal(self):
+        return self.kind == OperandKind.INT_LITERAL or self.kind == OperandKind.FLOAT_LITERAL
+
+    def __str__(self):
+        return self.name
+
+    def __repr__(self):
+        return f"Operand({self.kind.name}, {self.name})"
+
+class Quad:
+
+    # A single QUD instruction: an opcode and up to three operands, in the order they are written in the .qud file
+
+    __slots__ = ("opcode", "arg1", "arg2", "arg3")
+
+    def __init__(self, opcode, arg1=None, arg2=None, arg3=None):
+        self.opcode = opcode
+        self.arg1 = arg1
+        self.arg2 = arg2
+        self.arg3 = arg3
+
+    def operands(self):
+        return tuple(arg for arg in (self.arg1, self.arg2, self.arg3) if arg is not None)
+
+    def defined(self):
+        # the operand this quad writes, if any
+        if self.opcode in DEFINING_OPCODES:
+            return self.arg1
+        return None
+
+    def used(self):
+        # the operands this quad reads
+        if self.opcode in DEFINING_OPCODES:
+            return tuple(arg for arg in (self.arg2, self.arg3) if arg is not None)
+        if self.opcode == Opcode.IPRT or self.opcode == Opcode.RPRT:
+            return (self.arg1,)
+        if self.opcode == Opcode.JMPZ:
+            return (self.arg2,)
+        return ()
+
+    def replace_used(self, replace):
+        # a copy of the quad with every operand it reads passed through replace
+        if self.opcode in DEFINING_OPCODES:
+            return Quad(self.opcode, self.arg1,
+                        replace(self.arg2) if self.arg2 is not None else None,
+                        replace(self.arg3) if self.arg3 is not None else None)
+        if self.opcode == Opcode.IPRT or self.opcode == Opcode.RPRT:
+            return Quad(self.opcode, replace(self.arg1))
+        if self.opcode == Opcode.JMPZ:
+            return Quad(self.opcode, self.arg1, replace(self.arg2))
+        return self
+
+    def is_jump(self):
+        return self.opcode == Opcode.JUMP or self.opcode == Opcode.JMPZ
+
+    def __str__(self):
+        return format_quad(self)
+
+    def __repr__(self):
+        return f"Quad({format_quad(self)})"
+
+def format_quad(quad):
+    if quad.opcode == Opcode.LABEL:
+        return f"{quad.arg1.name}:"
+    if quad.arg1 is None:
+        return quad.opcode.name
+    if quad.arg2 is None:
+        return f"{quad.opcode.name} {quad.arg1.name}"
+    if quad.arg3 is None:
+        return f"{quad.opcode.name} {quad.arg1.name} {quad.arg2.name}"
+    return f"{quad.opcode.name} {quad.arg1.name} {quad.arg2.name} {quad.arg3.name}"
+
+def serialize(quads):
+    # the only place quads are turned into .qud text
+    for quad in quads:
+        yield format_quad(quad)
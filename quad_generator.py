@@ -1,360 +1,323 @@
 from consts import *
 import sys
+import heapq
 from quad_result import QuadResult
+from instruction_list import InstructionList
+from quad import Quad, Operand, OperandKind
+from constant_folding import fold
 
 class QuadGenerator:
 
-    def __init__(self, symbol_table):
+    def __init__(self, symbol_table, optimize=False):
+        self.optimize = optimize # fold operations on literals at compile time
         self.temp_int_count = 0
         self.temp_float_count = 0
         self.temp_label_count = 0
+        self.free_int_temps = []
+        self.free_float_temps = []
+        self.operands = {}
         self.symbol_table = symbol_table
 
-    def generate_conversion(self, source_type, source_value, temp_var):
-        if source_type == INT:
-            return f"{ITOR} {temp_var} {source_value}"
-        else:
-            return f"{RTOI} {temp_var} {source_value}"
-
-    def get_type(self, expression_value):
-        if expression_value.isdigit() or self.symbol_table.get(expression_value) == INT or expression_value.startswith("int_temp"):
-            return INT
-        elif expression_value.replace(".", "", 1).isdigit() or self.symbol_table.get(expression_value) == FLOAT or expression_value.startswith("float_temp"):
-            return FLOAT
-        else:
-            print(f"Error: Unknown expression type for {expression_value}", file=sys.stderr)
-            raise Exception(f"Unknown expression type for {expression_value}")
+    def get_type(self, result):
+        # the type is resolved when the node is created, it is None only for a value of unknown type
+        if result.type is None:
+            print(f"Error: Unknown expression type for {result.value}", file=sys.stderr)
+            raise Exception(f"Unknown expression type for {result.value}")
+        return result.type
 
     def generate_int_temp(self):
+        if self.free_int_temps:
+            return f"int_temp_{heapq.heappop(self.free_int_temps)}"
         self.temp_int_count += 1
         return f"int_temp_{self.temp_int_count}"
 
     def generate_float_temp(self):
+        if self.free_float_temps:
+            return f"float_temp_{heapq.heappop(self.free_float_temps)}"
         self.temp_float_count += 1
         return f"float_temp_{self.temp_float_count}"
 
+    def temp_result(self, code, value_type):
+        temp_var = self.generate_float_temp() if value_type == FLOAT else self.generate_int_temp()
+        return QuadResult(code, temp_var, value_type, OperandKind.TEMP)
+
+    def literal_result(self, code, literal):
+        value_type = INT if literal.kind == OperandKind.INT_LITERAL else FLOAT
+        return QuadResult(code, literal.name, value_type, literal.kind)
+
+    def release(self, *results):
+        # Every temp is read by exactly one quad, so once that quad is emitted the temp is free to hold the
+        # next result. The lowest numbered free temp is always handed out first, which keeps the number of
+        # distinct temps down to the deepest expression rather than the size of the program.
+        for result in results:
+            if result.kind == OperandKind.TEMP:
+                if result.type == INT:
+                    heapq.heappush(self.free_int_temps, int(result.value[9:]))
+                else:
+                    heapq.heappush(self.free_float_temps, int(result.value[11:]))
+
     def generate_temp_label(self):
         self.temp_label_count += 1
-        return f"label_temp_{self.temp_label_count}"
-
-    def generate_assignment(self, p):
-
-        variable_type = self.symbol_table.get(p.ID)
-        expression_type = self.get_type(p.expression.value)
-        generated_code = f"{p.expression.code}\n"
+        return Operand(OperandKind.LABEL, f"label_temp_{self.temp_label_count}")
+
+    def operand(self, value, kind):
+        # operands are interned so repeated uses of a variable or temp share one object
+        try:
+            return self.operands[value]
+        except KeyError:
+            operand = self.operands[value] = Operand(kind, value)
+            return operand
+
+    def result_operand(self, result):
+        return self.operand(result.value, result.kind)
+
+    def fold_quad(self, opcode, *results):
+        # the literal an operation on literals evaluates to, None when it's only known at run time
+        if not self.optimize:
+            return None
+        return fold(opcode, *(self.result_operand(result) for result in results))
+
+    def convert_to_float(self, result, generated_code):
+        # appends the conversion of an int result to generated_code, returns the converted result
+        folded = self.fold_quad(ITOR, result)
+        if folded is not None:
+            return self.literal_result(generated_code, folded)
+        self.release(result)
+        converted = self.temp_result(generated_code, FLOAT)
+        generated_code.append(Quad(ITOR, self.result_operand(converted), self.result_operand(result)))
+        return converted
+
+    def backpatch(self, jumps, label):
+        for jump in jumps:
+            jump.arg1 = label
+
+    def place_label(self, jumps, code):
+        if jumps:
+            label = self.generate_temp_label()
+            self.backpatch(jumps, label)
+            code.append(Quad(LABEL, label))
+
+    def branch(self, condition, code):
+        # emits the condition so that falling out of it is the true path, returns the jumps to the false path
+        code.extend(condition.code)
+        false_list = condition.false_list
+        if not condition.falls_through_on:
+            jump = Quad(JUMP)
+            code.append(jump)
+            false_list.append(jump)
+        self.place_label(condition.true_list, code)
+        return false_list
+
+    def generate_assignment(self, p, variable_id):
+        # variable_id is the symbol table id of the assigned variable, None when it isn't declared
+        expression = p.expression
+        variable_type = self.symbol_table.type_of(variable_id) if variable_id is not None else None
+        expression_type = self.get_type(expression)
+        generated_code = InstructionList()
+        generated_code.extend(expression.code)
 
         if variable_type == INT and expression_type == INT:
-            generated_code += f"{IASN} {p.ID} {p.expression.value}"
-            return QuadResult(generated_code)
-
+            opcode = IASN
         elif variable_type == FLOAT and expression_type == FLOAT:
-            generated_code += f"{RASN} {p.ID} {p.expression.value}"
-            return QuadResult(generated_code)
-
+            opcode = RASN
         elif variable_type == FLOAT and expression_type == INT:
-            temp_var = self.generate_int_temp()
-            conversion_code = self.generate_conversion(INT, p.expression.value, temp_var)
-            assignment_code = f"{RASN} {p.ID} {temp_var}\n"
-            generated_code += f"{conversion_code}\n{assignment_code}"
-            return QuadResult(generated_code)
+            expression = self.convert_to_float(expression, generated_code)
+            opcode = RASN
         else:
             print(f"Error: Type mismatch on line {p.lineno}.", file=sys.stderr)
             raise Exception("Type mismatch")
 
-    def generate_input(self, p):
-        if self.symbol_table.get(p.ID) == INT:
-            return QuadResult(f"{IINP} {p.ID}")
-        else:
-            return QuadResult(f"{RINP} {p.ID}")
+        generated_code.append(Quad(opcode, self.operand(p.ID, OperandKind.VARIABLE), self.result_operand(expression)))
+        self.release(expression)
+        return QuadResult(generated_code)
+
+    def generate_input(self, p, variable_id):
+        generated_code = InstructionList()
+        opcode = IINP if variable_id is not None and self.symbol_table.type_of(variable_id) == INT else RINP
+        generated_code.append(Quad(opcode, self.operand(p.ID, OperandKind.VARIABLE)))
+        return QuadResult(generated_code)
 
     def generate_output(self, p):
-        generated_code = f"{p.expression.code}\n"
-        if self.get_type(p.expression.value) == INT:
-            return QuadResult(generated_code + f"{IPRT} {p.expression.value}")
-        else:
-            return QuadResult(generated_code + f"{RPRT} {p.expression.value}")
+        expression = p.expression
+        generated_code = InstructionList()
+        generated_code.extend(expression.code)
+        opcode = IPRT if self.get_type(expression) == INT else RPRT
+        generated_code.append(Quad(opcode, self.result_operand(expression)))
+        self.release(expression)
+        return QuadResult(generated_code)
 
     def generate_if(self, p, if_code, else_code):
-        else_label = self.generate_temp_label()
+        code = InstructionList()
+        false_list = self.branch(p.boolexpr, code)
+        code.extend(if_code)
         end_label = self.generate_temp_label()
-        code = ""
-        code += f"{p.boolexpr.code}\n"
-        code += f"{JMPZ} {else_label} {p.boolexpr.value}\n"
-        code += f"{if_code}\n"
-        code += f"{JUMP} {end_label}\n"
-        code += f"{else_label}: {else_code}\n"
-        code += f"{end_label}:\n"
+        code.append(Quad(JUMP, end_label))
+        else_label = self.generate_temp_label()
+        self.backpatch(false_list, else_label)
+        code.append(Quad(LABEL, else_label))
+        code.extend(else_code)
+        code.append(Quad(LABEL, end_label))
         return QuadResult(code)
 
     def generate_while(self, p):
         start_label = self.generate_temp_label()
+        code = InstructionList()
+        code.append(Quad(LABEL, start_label))
+        false_list = self.branch(p.boolexpr, code)
+        code.extend(p.stmt.code)
+        code.append(Quad(JUMP, start_label))
         end_label = self.generate_temp_label()
-        code = ""
-        code += f"{start_label}:\n"
-        code += f"{p.boolexpr.code}\n"
-        code += f"{JMPZ} {end_label} {p.boolexpr.value}\n"
-        code += f"{p.stmt.code}\n"
-        code += f"{JUMP} {start_label}\n"
-        code += f"{end_label}:\n"
+        self.backpatch(false_list, end_label)
+        code.append(Quad(LABEL, end_label))
         return QuadResult(code)
 
     def generate_or(self, p):
-        end_label = self.generate_temp_label()
-        false_label = self.generate_temp_label()
-        or_result_var = self.generate_int_temp()
-
-        code = ""
-        code += f"{p.boolexpr.code}"
-        code += f"{JMPZ} {false_label} {p.boolexpr.value}\n"
-        code += f"{IASN} {or_result_var} 1\n"
-        code += f"{JUMP} {end_label}\n"
-        code += f"{false_label}: {p.boolterm.code}\n"
-        code += f"{JMPZ} {false_label} {p.boolterm.value}\n"
-        code += f"{IASN} {or_result_var} 1\n"
-        code += f"{end_label}:\n"
-
-        return QuadResult(code, or_result_var)
+        # when the left side is true the right side is skipped, otherwise control goes on to it
+        code = InstructionList()
+        code.extend(p.boolexpr.code)
+        true_list = p.boolexpr.true_list
+        if p.boolexpr.falls_through_on:
+            jump = Quad(JUMP)
+            code.append(jump)
+            true_list.append(jump)
+        self.place_label(p.boolexpr.false_list, code)
+        code.extend(p.boolterm.code)
+        true_list.extend(p.boolterm.true_list)
+
+        return QuadResult(code, true_list=true_list, false_list=p.boolterm.false_list,
+                          falls_through_on=p.boolterm.falls_through_on)
 
     def generate_and(self, p):
-        end_label = self.generate_temp_label()
-        false_label = self.generate_temp_label()
-        and_result_var = self.generate_int_temp()
-
-        code = ""
-        code += f"{p.boolterm.code}"
-        code += f"{JMPZ} {false_label} {p.boolterm.value}\n"
-        code += f"{p.boolfactor.code}\n"
-        code += f"{JMPZ} {false_label} {p.boolfactor.value}\n"
-        code += f"{IASN} {and_result_var} 1\n"
-        code += f"{JUMP} {end_label}\n"
-        code += f"{false_label}: {IASN} {and_result_var} 0\n"
-        code += f"{end_label}:\n"
-
-        return QuadResult(code, and_result_var)
+        # when the left side is false the right side is skipped, otherwise control goes on to it
+        code = InstructionList()
+        code.extend(p.boolterm.code)
+        false_list = p.boolterm.false_list
+        if not p.boolterm.falls_through_on:
+            jump = Quad(JUMP)
+            code.append(jump)
+            false_list.append(jump)
+        self.place_label(p.boolterm.true_list, code)
+        code.extend(p.boolfactor.code)
+        false_list.extend(p.boolfactor.false_list)
+
+        return QuadResult(code, true_list=p.boolfactor.true_list, false_list=false_list,
+                          falls_through_on=p.boolfactor.falls_through_on)
 
     def generate_not(self, p):
-        not_result_var = self.generate_int_temp()
-
-        code = ""
-        code += f"{p.boolexpr.code}\n"
-        code += f"{IEQL} {not_result_var} {p.boolexpr.value} 0\n"
-
-        return QuadResult(code, not_result_var)
+        # no code at all, the jumps to the true and false targets just trade places
+        return QuadResult(p.boolexpr.code, true_list=p.boolexpr.false_list, false_list=p.boolexpr.true_list,
+                          falls_through_on=not p.boolexpr.falls_through_on)
 
     def generate_relop(self, p):
-
-        expression0_type = self.get_type(p.expression0.value)
-        expression1_type = self.get_type(p.expression1.value)
-
-        generated_code = f"{p.expression0.code}\n{p.expression1.code}\n"
-
-        relop_result_var = ""
-
-        expression0_value = p.expression0.value
-        expression1_value = p.expression1.value
-
-        if expression1_type == FLOAT and expression0_type == INT:
-            temp_var = self.generate_float_temp()
-            generated_code += self.generate_conversion(INT, p.expression0.value, temp_var) + "\n"
-            expression0_value = temp_var
-            expression0_type = FLOAT  
-        elif expression1_type == INT and expression0_type == FLOAT:
-            temp_var = self.generate_float_temp()
-            generated_code += self.generate_conversion(INT, p.expression1.value, temp_var) + "\n"
-            expression1_value = temp_var
-            expression1_type = FLOAT  
-
-        if expression0_type == FLOAT and expression1_type == FLOAT:
-            relop_result_var = self.generate_float_temp()
-
-            if p.RELOP == EQUAL:
-                generated_code += f"REQL {relop_result_var} {expression0_value} {expression1_value}\n"
-            elif p.RELOP == NOT_EQUAL:
-                generated_code += f"RNQL {relop_result_var} {expression0_value} {expression1_value}\n"
-            elif p.RELOP == LESS_THAN:
-                generated_code += (
-                    f"RLSS {relop_result_var} {expression0_value} {expression1_value}\n"
-                )
-            elif p.RELOP == GREATER_THAN:
-                generated_code += (
-                    f"RGRT {relop_result_var} {expression0_value} {expression1_value}\n"
-                )
-            elif p.RELOP == LESS_THAN_EQUAL:
-                temp_var = self.generate_float_temp()
-                generated_code += f"RGRT {relop_result_var} {expression0_value} {expression1_value}\n"
-                generated_code += f"REQL {relop_result_var} {temp_var} 0\n"
-            elif p.RELOP == GREATER_THAN_EQUAL:
-                temp_var = self.generate_float_temp()
-                generated_code += f"RLSS {relop_result_var} {expression0_value} {expression1_value}\n"
-                generated_code += f"REQL {relop_result_var} {temp_var} 0\n"
-            else:
-                print(f"Error: Unsupported relational operator for floats: {p.RELOP}.", file=sys.stderr)
-                raise Exception(
-                    f"Unsupported relational operator for floats: {p.RELOP}"
-                )
-
-        elif expression0_type == INT and expression1_type == INT:
-            relop_result_var = self.generate_int_temp()
-            if p.RELOP == "==":
-                generated_code += f"IEQL {relop_result_var} {expression0_value} {expression1_value}"
-            elif p.RELOP == "!=":
-                generated_code += f"INQL {relop_result_var} {expression0_value} {expression1_value}"
-            elif p.RELOP == "<":
-                generated_code += f"ILSS {relop_result_var} {expression0_value} {expression1_value}"
-            elif p.RELOP == ">":
-                generated_code += f"IGRT {relop_result_var} {expression0_value} {expression1_value}"
-            elif p.RELOP == "<=":
-                temp_var = self.generate_int_temp()
-                generated_code += f"IGRT {temp_var} {expression0_value} {expression1_value}\n"
-                generated_code += f"IEQL {relop_result_var} {temp_var} 0"
-            elif p.RELOP == ">=":
-                temp_var = self.generate_int_temp()
-                generated_code += f"ILSS {temp_var} {expression0_value} {expression1_value}\n"
-                generated_code += f"IEQL {relop_result_var} {temp_var} 0"
-            else:
-                print(
-                    f"Error: Unsupported relational operator for integers: {p.RELOP}.",
-                    file=sys.stderr,
-                )
-                raise Exception(
-                    f"Unsupported relational operator for integers: {p.RELOP}"
-                )
-
-        return QuadResult(generated_code, relop_result_var)
-
-    def generate_expression(self, p):
-        generated_code = f"{p.expression.code}\n{p.term.code}\n"
-        result_var = ""
-
-        expression_type = self.get_type(p.expression.value)
-
-        term_type = self.get_type(p.term.value)
-        result_var = ""
-
-        first_operand = p.expression.value
-        second_operand = p.term.value
-
-        if expression_type == FLOAT and term_type == INT:
-            first_operand = self.generate_float_temp()
-            generated_code += self.generate_conversion(INT, p.term.value, first_operand) + "\n"
-            second_operand = p.expression.value
-            term_type = FLOAT  
-            result_type = FLOAT
-        elif expression_type == INT and term_type == FLOAT:
-            first_operand = self.generate_float_temp()
-            generated_code += self.generate_conversion(INT, p.expression.value, first_operand) + "\n"
-            second_operand = p.term.value
-            expression_type = FLOAT
-            result_type = FLOAT
-        elif expression_type == FLOAT and term_type == FLOAT:
-            result_type = FLOAT
-        else:
-            result_type = INT
-
-        if result_type == FLOAT:
-
-            result_var = self.generate_float_temp()
-            if p.ADDOP == PLUS:
-                generated_code += f"{RADD} {result_var} {first_operand} {second_operand}"
-            elif p.ADDOP == MINUS:
-                generated_code += (
-                    f"{RSUB} {result_var} {first_operand} {second_operand}"
-                )
-            else:
-                print(f"Error: Unsupported operator for floats: {p.ADDOP}.", file=sys.stderr)
-                raise Exception(f"Unsupported operator for floats: {p.ADDOP}")
+        left = p.expression0
+        right = p.expression1
+        relop = p.RELOP
+        left_type = self.get_type(left)
+        right_type = self.get_type(right)
+
+        generated_code = InstructionList()
+        generated_code.extend(left.code)
+        generated_code.extend(right.code)
+
+        if right_type == FLOAT and left_type == INT:
+            left = self.convert_to_float(left, generated_code)
+        elif right_type == INT and left_type == FLOAT:
+            right = self.convert_to_float(right, generated_code)
+        is_float = left_type == FLOAT or right_type == FLOAT
+
+        # <= and >= are tested as the negation of > and <: their JMPZ is taken when the condition is true
+        negate = relop == LESS_THAN_EQUAL or relop == GREATER_THAN_EQUAL
+
+        if relop == EQUAL:
+            opcode = REQL if is_float else IEQL
+        elif relop == NOT_EQUAL:
+            opcode = RNQL if is_float else INQL
+        elif relop == LESS_THAN or relop == GREATER_THAN_EQUAL:
+            opcode = RLSS if is_float else ILSS
+        elif relop == GREATER_THAN or relop == LESS_THAN_EQUAL:
+            opcode = RGRT if is_float else IGRT
         else:
+            print(f"Error: Unsupported relational operator: {relop}.", file=sys.stderr)
+            raise Exception(f"Unsupported relational operator: {relop}")
+
+        # a condition known at compile time needs no code, control just falls through as true or false
+        folded = self.fold_quad(opcode, left, right)
+        if folded is not None:
+            return QuadResult(generated_code, true_list=[], false_list=[], falls_through_on=(folded.name != "0") != negate)
+
+        self.release(left, right)
+        relop_result = self.temp_result(generated_code, INT)
+        relop_result_operand = self.result_operand(relop_result)
+        generated_code.append(Quad(opcode, relop_result_operand, self.result_operand(left), self.result_operand(right)))
+        jump = Quad(JMPZ, None, relop_result_operand)
+        generated_code.append(jump)
+        self.release(relop_result)
+
+        if negate:
+            return QuadResult(generated_code, true_list=[jump], false_list=[], falls_through_on=False)
+        return QuadResult(generated_code, true_list=[], false_list=[jump], falls_through_on=True)
+
+    def generate_arithmetic(self, left, right, int_opcode, float_opcode):
+        # the int side of a mixed operation is converted to float, in place, so the operand order is kept
+        generated_code = InstructionList()
+        generated_code.extend(left.code)
+        generated_code.extend(right.code)
+
+        left_type = self.get_type(left)
+        right_type = self.get_type(right)
+        if left_type == FLOAT and right_type == INT:
+            right = self.convert_to_float(right, generated_code)
+        elif left_type == INT and right_type == FLOAT:
+            left = self.convert_to_float(left, generated_code)
+
+        result_type = FLOAT if left_type == FLOAT or right_type == FLOAT else INT
+        opcode = float_opcode if result_type == FLOAT else int_opcode
+
+        folded = self.fold_quad(opcode, left, right)
+        if folded is not None:
+            return self.literal_result(generated_code, folded)
+
+        self.release(left, right)
+        result = self.temp_result(generated_code, result_type)
+        generated_code.append(Quad(opcode, self.result_operand(result), self.result_operand(left), self.result_operand(right)))
+        return result
 
-            result_var = self.generate_int_temp()
-            if p.ADDOP == PLUS:
-                generated_code += (
-                    f"{IADD} {result_var} {first_operand} {second_operand}"
-                )
-            elif p.ADDOP == MINUS:
-                generated_code += (
-                    f"{ISUB} {result_var} {first_operand} {second_operand}"
-                )
-            else:
-                print(f"Error: Unsupported operator for integers: {p.ADDOP}.", file=sys.stderr)
-                raise Exception(f"Unsupported operator for integers: {p.ADDOP}")
-
-        return QuadResult(generated_code, result_var)
+    def generate_expression(self, p):
+        addop = p.ADDOP
+        if addop == PLUS:
+            return self.generate_arithmetic(p.expression, p.term, IADD, RADD)
+        elif addop == MINUS:
+            return self.generate_arithmetic(p.expression, p.term, ISUB, RSUB)
+        print(f"Error: Unsupported operator: {addop}.", file=sys.stderr)
+        raise Exception(f"Unsupported operator: {addop}")
 
     def generate_term(self, p):
-
-        generated_code = f"{p.term.code}\n{p.factor.code}\n"
-        result_var = ""
-
-        term_type = self.get_type(p.term.value)
-        factor_type = self.get_type(p.factor.value)
-
-        first_operand = p.term.value
-        second_operand = p.factor.value
-
-        if term_type == FLOAT and factor_type == INT:
-            first_operand = self.generate_float_temp()
-            generated_code += (
-                self.generate_conversion(INT, p.factor.value, first_operand) + "\n"
-            )
-            second_operand = p.term.value
-            factor_type = FLOAT  
-            result_type = FLOAT 
-        elif term_type == INT and factor_type == FLOAT:
-            first_operand = self.generate_float_temp()
-            generated_code += (
-                self.generate_conversion(INT, p.term.value, first_operand) + "\n"
-            )
-            second_operand = p.factor.value
-            term_type = FLOAT
-            result_type = FLOAT
-        elif term_type == FLOAT and factor_type == FLOAT:
-
-            result_type = FLOAT
-        else:
-            result_type = INT
-
-        if result_type == FLOAT:
-            result_var = self.generate_float_temp()
-            if p.MULOP == MULTIPLY:
-                generated_code += (
-                    f"{RMLT} {result_var} {first_operand} {second_operand}"
-                )
-            elif p.MULOP == DIVIDE:
-                generated_code += (
-                    f"{RDIV} {result_var} {first_operand} {second_operand}"
-                )
-            else:
-                print(f"Error: Unsupported operator for floats: {p.MULOP}.", file=sys.stderr)
-                raise Exception(f"Unsupported operator for floats: {p.MULOP}")
-        else:
-            result_var = self.generate_int_temp()
-            if p.MULOP == MULTIPLY:
-                generated_code += (
-                    f"{IMLT} {result_var} {first_operand} {second_operand}"
-                )
-            elif p.MULOP == DIVIDE:
-                generated_code += (
-                    f"{IDIV} {result_var} {first_operand} {second_operand}"
-                )
-            else:
-                print(f"Error: Unsupported operator for integers: {p.MULOP}.", file=sys.stderr)
-                raise Exception(f"Unsupported operator for integers: {p.MULOP}")
-        return QuadResult(generated_code, result_var)
+        mulop = p.MULOP
+        if mulop == MULTIPLY:
+            return self.generate_arithmetic(p.term, p.factor, IMLT, RMLT)
+        elif mulop == DIVIDE:
+            return self.generate_arithmetic(p.term, p.factor, IDIV, RDIV)
+        print(f"Error: Unsupported operator: {mulop}.", file=sys.stderr)
+        raise Exception(f"Unsupported operator: {mulop}")
 
     def generate_cast(self, p):
-        generated_code = f"{p.expression.code}\n"
-        expression_type = self.get_type(p.expression.value)
+        expression = p.expression
+        generated_code = InstructionList()
+        generated_code.extend(expression.code)
+        expression_type = self.get_type(expression)
         target_type = self.extract_cast_type(p.CAST)
         if expression_type == target_type:
-            return QuadResult(generated_code, p.expression.value)
+            return QuadResult(generated_code, expression.value, expression.type, expression.kind)
         elif expression_type == INT and target_type == FLOAT:
-            cast_result_var = self.generate_float_temp()
-            generated_code += self.generate_conversion(INT, p.expression.value, cast_result_var)
-            return QuadResult(generated_code, cast_result_var)
+            return self.convert_to_float(expression, generated_code)
         elif expression_type == FLOAT and target_type == INT:
-            cast_result_var = self.generate_int_temp()
-            generated_code += self.generate_conversion(FLOAT, p.expression.value, cast_result_var)
-            return QuadResult(generated_code, cast_result_var)
+            folded = self.fold_quad(RTOI, expression)
+            if folded is not None:
+                return self.literal_result(generated_code, folded)
+            self.release(expression)
+            cast_result = self.temp_result(generated_code, INT)
+            generated_code.append(Quad(RTOI, self.result_operand(cast_result), self.result_operand(expression)))
+            return cast_result
         else:
             print(
                 f"Error: Cannot cast {expression_type} to w{target_type}.",
@@ -1,4 +1,23 @@
+from instruction_list import InstructionList
+
 class QuadResult:
-    def __init__(self, code, value=None):
-        self.code = code
+
+    # An expression carries its value (the name of the variable, temp or literal that holds it) together
+    # with its type (INT or FLOAT) and operand kind, both resolved once when the node is created.
+    #
+    # Boolean expressions are compiled to jumps rather than to a value: true_list and false_list hold the
+    # jumps that still wait for the label of the true and false targets, and falls_through_on tells what
+    # it means when control reaches the end of the code without jumping.
+
+    def __init__(self, code=None, value=None, type=None, kind=None, true_list=None, false_list=None,
+                 falls_through_on=True):
+        self.code = code if code is not None else InstructionList()
         self.value = value
+        self.type = type
+        self.kind = kind
+        self.true_list = true_list
+        self.false_list = false_list
+        self.falls_through_on = falls_through_on
+
+    def is_condition(self):
+        return self.true_list is not None
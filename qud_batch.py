@@ -0,0 +1,271 @@
+import argparse
+import sys
+import time
+from pathlib import Path
+from consts import *
+from qud_vm import load, truncating_division
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Runs one .qud program over many input records at once, a lane per record. Every variable and temp is a
+# NumPy array with an element per lane and literals stay scalars, so an instruction runs as one array
+# operation over all the lanes at it. Each lane has its own pc: a JMPZ the lanes disagree on splits them,
+# and the lanes at the lowest pc always run first, so lanes that leave a loop early wait after it for the
+# others and go on together again. A lane stops at HALT or when it fails, the others keep running.
+#
+# Ints are 64 bit here, where the QudMachine's grow without bound: arithmetic wraps around, and an input
+# or a float to int conversion that does not fit fails the record.
+
+RELATIONS = {IEQL: "equal", INQL: "not_equal", ILSS: "less", IGRT: "greater",
+             REQL: "equal", RNQL: "not_equal", RLSS: "less", RGRT: "greater"}
+ARITHMETIC = {IADD: "add", ISUB: "subtract", IMLT: "multiply",
+              RADD: "add", RSUB: "subtract", RMLT: "multiply"}
+
+# floats past this magnitude do not fit in an int64
+INT_LIMIT = 2.0 ** 63
+
+def require_numpy():
+    if np is None:
+        print("Batch execution needs NumPy, install it with: pip install numpy", file=sys.stderr)
+        raise Exception("NumPy is not installed")
+
+class BatchMachine:
+
+    def __init__(self, program, records):
+        require_numpy()
+        self.program = program
+        self.records = [[str(field).strip() for field in record] for record in records]
+        self.count = len(self.records)
+        self.slots = len(program.names)
+        self.dtypes = [np.float64 if is_float else np.int64 for is_float in program.float_names]
+        self.operations = {opcode: getattr(np, name) for opcode, name in ARITHMETIC.items()}
+        self.operations.update((opcode, getattr(np, name)) for opcode, name in RELATIONS.items())
+        self.constants = []
+        for value in program.int_constants:
+            if not -INT_LIMIT <= value < INT_LIMIT:
+                print(f"Integer literal {value} does not fit in 64 bits", file=sys.stderr)
+                raise Exception("Integer literal out of range")
+            self.constants.append(np.int64(value))
+        self.constants.extend(np.float64(value) for value in program.float_constants)
+        self.outputs = [[] for _ in range(self.count)]
+        self.errors = [None] * self.count
+        self.executed = 0
+        self.steps = 0
+        self.elapsed = 0.0
+
+    def input_tables(self):
+        # every input field parsed once both ways, the extra column is read past the end of a record
+        width = max((len(record) for record in self.records), default=0) + 1
+        tables = {}
+        for convert, dtype in ((int, np.int64), (float, np.float64)):
+            values = np.zeros((self.count, width), dtype)
+            valid = np.zeros((self.count, width), bool)
+            for lane, record in enumerate(self.records):
+                for column, field in enumerate(record):
+                    try:
+                        values[lane, column] = convert(field)
+                    except (ValueError, OverflowError):
+                        continue
+                    valid[lane, column] = True
+            tables[convert] = (values, valid)
+        return tables
+
+    def fetch(self, slot, lanes):
+        if slot >= self.slots:
+            return self.memory[slot]
+        return self.memory[slot] if lanes is None else self.memory[slot][lanes]
+
+    def store(self, slot, value, lanes):
+        if lanes is None:
+            # the slot takes over an array value, so value must not be another slot's array
+            if np.ndim(value) == 0:
+                self.memory[slot] = np.full(self.count, value, self.dtypes[slot])
+            else:
+                self.memory[slot] = np.asarray(value, self.dtypes[slot])
+        else:
+            self.memory[slot][lanes] = value
+
+    def stop(self, lanes, message=None):
+        # message is the error of every lane, a list of one per lane, or None for lanes that halted
+        for index, lane in enumerate(lanes.tolist()):
+            self.errors[lane] = message[index] if isinstance(message, list) else message
+        self.running[lanes] = False
+        self.alive = np.flatnonzero(self.running)
+
+    def survivors(self, ids, failed, message):
+        # the lanes that go on after the failed ones stop, and which of ids they are
+        failed = np.broadcast_to(failed, ids.shape)
+        if not failed.any():
+            return None, None
+        self.stop(ids[failed], message)
+        return ids[~failed], ~failed
+
+    def read_input(self, a, lanes, ids, convert):
+        values, valid = self.tables[convert]
+        columns = self.cursor[ids]
+        ok = valid[ids, columns]
+        if not ok.all():
+            messages = []
+            for lane, column in zip(ids[~ok].tolist(), columns[~ok].tolist()):
+                record = self.records[lane]
+                messages.append(f"Invalid input: {record[column] if column < len(record) else ''!r}")
+            self.stop(ids[~ok], messages)
+            lanes, ids, columns = ids[ok], ids[ok], columns[ok]
+        self.store(a, values[ids, columns], lanes)
+        self.cursor[ids] += 1
+
+    def run(self):
+        program = self.program
+        memory = [np.zeros(self.count, dtype) for dtype in self.dtypes] + self.constants
+        self.memory = memory
+        self.tables = self.input_tables()
+        self.cursor = np.zeros(self.count, np.int64)
+        self.running = np.ones(self.count, bool)
+        self.alive = np.arange(self.count)
+        everyone = self.alive
+        printed = []
+        end = len(program)
+
+        # while together every running lane is at pc, otherwise each one is at its entry in pcs
+        pcs = np.zeros(self.count, np.int64)
+        pc = 0
+        together = True
+
+        executed = 0
+        steps = 0
+        start = time.perf_counter()
+        try:
+            with np.errstate(all="ignore"):
+                while self.alive.size:
+                    alive = self.alive
+                    if not together:
+                        at = pcs[alive]
+                        pc = int(at.min())
+                        lanes = alive[at == pc]
+                        together = lanes.size == alive.size
+                    if together:
+                        lanes = None if alive.size == self.count else alive
+                    ids = everyone if lanes is None else lanes
+                    if pc == end:
+                        self.stop(ids, "Execution ran past the end of the program without reaching HALT")
+                        continue
+                    steps += 1
+                    executed += ids.size
+
+                    opcode = program.opcodes[pc]
+                    a, b, c = program.arg1[pc], program.arg2[pc], program.arg3[pc]
+                    following = pc + 1
+
+                    if opcode in RELATIONS or opcode in ARITHMETIC:
+                        self.store(a, self.operations[opcode](self.fetch(b, lanes), self.fetch(c, lanes)), lanes)
+                    elif opcode == IASN or opcode == RASN:
+                        self.store(a, np.copy(self.fetch(b, lanes)), lanes)
+                    elif opcode == IPRT or opcode == RPRT:
+                        printed.append((ids, np.array(np.broadcast_to(self.fetch(a, lanes), ids.shape))))
+                    elif opcode == IINP:
+                        self.read_input(a, lanes, ids, int)
+                    elif opcode == RINP:
+                        self.read_input(a, lanes, ids, float)
+                    elif opcode == IDIV or opcode == RDIV:
+                        left, right = self.fetch(b, lanes), self.fetch(c, lanes)
+                        survivors, kept = self.survivors(ids, right == 0, f"Division by zero on line {pc + 1}")
+                        if kept is not None:
+                            lanes = survivors
+                            left = np.broadcast_to(left, kept.shape)[kept]
+                            right = np.broadcast_to(right, kept.shape)[kept]
+                        if opcode == RDIV:
+                            self.store(a, np.true_divide(left, right), lanes)
+                        else:
+                            self.store(a, truncating_division(left, right), lanes)
+                    elif opcode == ITOR:
+                        self.store(a, np.asarray(self.fetch(b, lanes)).astype(np.float64), lanes)
+                    elif opcode == RTOI:
+                        value = self.fetch(b, lanes)
+                        fits = np.isfinite(value) & (np.abs(value) < INT_LIMIT)
+                        survivors, kept = self.survivors(ids, ~fits, f"Float out of int range on line {pc + 1}")
+                        if kept is not None:
+                            lanes = survivors
+                            value = np.broadcast_to(value, kept.shape)[kept]
+                        self.store(a, np.trunc(value).astype(np.int64), lanes)
+                    elif opcode == JUMP:
+                        following = a
+                    elif opcode == JMPZ:
+                        zero = self.fetch(b, lanes) == 0
+                        if np.all(zero):
+                            following = a
+                        elif np.any(zero):
+                            # the lanes part ways
+                            if together:
+                                pcs[alive] = pc
+                                together = False
+                            pcs[ids] = np.where(zero, a, following)
+                            continue
+                    elif opcode == HALT:
+                        self.stop(ids)
+                        continue
+
+                    if together:
+                        pc = following
+                    else:
+                        pcs[ids] = following
+        finally:
+            self.elapsed = time.perf_counter() - start
+            self.executed = executed
+            self.steps = steps
+            # the printed values, formatted the way the QudMachine writes them
+            for ids, values in printed:
+                for lane, value in zip(ids.tolist(), values.tolist()):
+                    self.outputs[lane].append(f"{value}")
+
+        return memory
+
+    def report(self, stream=None):
+        rate = self.executed / self.elapsed if self.elapsed > 0 else 0.0
+        print(f"Ran {self.count} records, {self.executed} instructions in {self.steps} vector steps, "
+              f"in {self.elapsed:.3f}s ({rate:,.0f} instructions/s)",
+              file=stream if stream is not None else sys.stderr)
+
+def read_records(stream):
+    # a record per line, its input values separated by whitespace
+    return [line.split() for line in stream.read().splitlines()]
+
+def main():
+    parser = argparse.ArgumentParser(description='Run a QUD program over many input records at once')
+    parser.add_argument('-f', '--file', type=Path, help='Path of the .qud or .qudb file to run', required=True)
+    parser.add_argument('-i', '--input', type=Path,
+                        help='File with a record of input values per line (default: standard input)')
+    args = parser.parse_args()
+
+    try:
+        program = load(args.file)
+        if args.input is not None:
+            with open(args.input) as stream:
+                records = read_records(stream)
+        else:
+            records = read_records(sys.stdin)
+    except FileNotFoundError as e:
+        print(f"Input file not found: {e.filename}", file=sys.stderr)
+        return
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return
+
+    try:
+        machine = BatchMachine(program, records)
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return
+    machine.run()
+
+    # a line per record with what it printed, and the error of every record that failed
+    for number, (output, error) in enumerate(zip(machine.outputs, machine.errors), 1):
+        print(" ".join(output))
+        if error is not None:
+            print(f"Record {number}: Runtime error: {error}", file=sys.stderr)
+    machine.report()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+import mmap
+import struct
+import sys
+from array import array
+from pathlib import Path
+from qud_vm import QudProgram
+
+# A binary companion to the .qud text: the decoded QudProgram image written as arrays, so loading it is a
+# memory map instead of a parse. All values are little-endian and every section starts 8 byte aligned.
+#
+#   header           magic, format version, instruction/name/constant counts, size of the name table
+#   opcodes          uint8 per instruction
+#   arg1, arg2, arg3 int32 per instruction: memory slots, or 0-based jump targets for JUMP/JMPZ, -1 if unused
+#   float names      uint8 per name, 1 if the variable holds a float
+#   int constants    int64 pool, memory slots right after the names
+#   float constants  float64 pool, memory slots right after the int constants
+#   names            utf-8 names separated by NUL bytes
+
+BINARY_SUFFIX = ".qudb"
+MAGIC = b"QUDB"
+VERSION = 1
+HEADER = struct.Struct("<4sHHIIIII")
+ALIGNMENT = 8
+
+def padding(size):
+    return -size % ALIGNMENT
+
+def little_endian(values):
+    if sys.byteorder != "little":
+        values.byteswap()
+    return values
+
+def write_binary(program, path):
+    names = "\0".join(program.names).encode("utf-8")
+    try:
+        int_constants = array("q", program.int_constants)
+    except OverflowError:
+        raise Exception("Integer constant does not fit in 64 bits")
+
+    sections = [
+        array("B", program.opcodes),
+        little_endian(array("i", program.arg1)),
+        little_endian(array("i", program.arg2)),
+        little_endian(array("i", program.arg3)),
+        array("B", program.float_names),
+        little_endian(int_constants),
+        little_endian(array("d", program.float_constants)),
+    ]
+
+    with open(path, "wb") as output:
+        output.write(HEADER.pack(MAGIC, VERSION, 0, len(program.opcodes), len(program.names),
+                                 len(program.int_constants), len(program.float_constants), len(names)))
+        output.write(bytes(padding(HEADER.size)))
+        for section in sections:
+            data = section.tobytes()
+            output.write(data)
+            output.write(bytes(padding(len(data))))
+        output.write(names)
+
+def load_binary(path):
+    with open(path, "rb") as source:
+        mapping = mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ)
+
+    view = memoryview(mapping)
+    if len(view) < HEADER.size:
+        raise Exception(f"{path} is not a binary QUD file")
+    magic, version, _, instructions, name_count, int_count, float_count, names_size = HEADER.unpack_from(view)
+    if magic != MAGIC or version != VERSION:
+        raise Exception(f"{path} is not a version {VERSION} binary QUD file")
+
+    offset = HEADER.size + padding(HEADER.size)
+
+    def section(code, count, itemsize):
+        nonlocal offset
+        size = count * itemsize
+        if offset + size > len(view):
+            raise Exception(f"{path} is truncated")
+        values = view[offset:offset + size].cast(code)
+        if itemsize > 1 and sys.byteorder != "little":
+            # only big-endian hosts pay for a copy
+            values = array(code, values)
+            values.byteswap()
+        offset += size + padding(size)
+        return values
+
+    opcodes = section("B", instructions, 1)
+    arg1 = section("i", instructions, 4)
+    arg2 = section("i", instructions, 4)
+    arg3 = section("i", instructions, 4)
+    float_names = section("B", name_count, 1)
+    int_constants = section("q", int_count, 8)
+    float_constants = section("d", float_count, 8)
+    names = bytes(view[offset:offset + names_size]).decode("utf-8").split("\0") if name_count else []
+
+    program = QudProgram(opcodes, arg1, arg2, arg3, names, float_names, int_constants, float_constants)
+    # the arrays above are views into the map, it has to stay open as long as the program is used
+    program.mapping = mapping
+    return program
+
+def binary_path(path):
+    return Path(path).with_suffix(BINARY_SUFFIX)
@@ -0,0 +1,209 @@
+import argparse
+import math
+import sys
+import time
+from pathlib import Path
+from consts import *
+from qud_vm import QudMachine, load, truncating_division
+
+# Runs a decoded .qud program by translating it to Python once and letting Python run it, rather than
+# interpreting it an instruction at a time. The program becomes a single function: every memory slot
+# is a local variable, literals are written in place, and each basic block is straight-line code that
+# ends by setting pc to the block to run next. A loop around a balanced tree of "if pc < start" tests
+# picks the block. Instructions are counted a block at a time.
+
+INDENT = "    "
+
+RELATIONS = {IEQL: "==", INQL: "!=", ILSS: "<", IGRT: ">", REQL: "==", RNQL: "!=", RLSS: "<", RGRT: ">"}
+ARITHMETIC = {IADD: "+", ISUB: "-", IMLT: "*", RADD: "+", RSUB: "-", RMLT: "*"}
+
+def integer_division(left, right, line):
+    if right == 0:
+        raise Exception(f"Division by zero on line {line}")
+    return truncating_division(left, right)
+
+def division_by_zero(line):
+    raise Exception(f"Division by zero on line {line}")
+
+def ran_past_end():
+    raise Exception("Execution ran past the end of the program without reaching HALT")
+
+def literal(value):
+    # a decoded .qud literal can be any float Python parses, inf and nan included
+    if isinstance(value, float) and not math.isfinite(value):
+        return f"float('{value!r}')"
+    return repr(value)
+
+def block_starts(program):
+    starts = {0}
+    for index, opcode in enumerate(program.opcodes):
+        if opcode == JUMP or opcode == JMPZ:
+            starts.add(program.arg1[index])
+            starts.add(index + 1)
+        elif opcode == HALT:
+            starts.add(index + 1)
+    return sorted(start for start in starts if start < len(program))
+
+class Translator:
+
+    def __init__(self, program):
+        self.program = program
+        self.constants = program.initial_memory()
+        self.slots = len(program.names)
+        # a slot past the names holds a constant, which is written as a literal
+        self.operands = [self.variable(slot, name) for slot, name in enumerate(program.names)]
+        self.operands.extend(literal(value) for value in self.constants[self.slots:])
+        self.lines = []
+
+    def variable(self, slot, name):
+        return f"v_{name}" if name.isidentifier() else f"v{slot}"
+
+    def emit(self, depth, line):
+        self.lines.append(INDENT * depth + line)
+
+    def translate(self):
+        program = self.program
+        names = self.operands[:self.slots]
+        self.emit(0, "def run(memory, write, read_number, stats):")
+        for slot, name in enumerate(names):
+            self.emit(1, f"{name} = memory[{slot}]")
+        self.emit(1, "executed = 0")
+        self.emit(1, "pc = 0")
+        self.emit(1, "try:")
+        self.emit(2, "while True:")
+
+        starts = block_starts(program)
+        ends = starts[1:] + [len(program)]
+        self.emit_tree(list(zip(starts, ends)), 3)
+
+        self.emit(1, "finally:")
+        if names:
+            self.emit(2, f"memory[:{self.slots}] = [{', '.join(names)}]")
+        self.emit(2, "stats[0] = executed")
+        return "\n".join(self.lines) + "\n"
+
+    def emit_tree(self, blocks, depth):
+        if len(blocks) == 1:
+            self.emit_block(*blocks[0], depth)
+            return
+        middle = len(blocks) // 2
+        self.emit(depth, f"if pc < {blocks[middle][0]}:")
+        self.emit_tree(blocks[:middle], depth + 1)
+        self.emit(depth, "else:")
+        self.emit_tree(blocks[middle:], depth + 1)
+
+    def emit_block(self, start, end, depth):
+        program = self.program
+        operands = self.operands
+        self.emit(depth, f"executed += {end - start}")
+        for index in range(start, end):
+            opcode = program.opcodes[index]
+            a, b, c = program.arg1[index], program.arg2[index], program.arg3[index]
+            line = index + 1
+
+            if opcode == IASN or opcode == RASN:
+                self.emit(depth, f"{operands[a]} = {operands[b]}")
+            elif opcode == IPRT or opcode == RPRT:
+                self.emit(depth, f'write(f"{{{operands[a]}}}\\n")')
+            elif opcode == IINP:
+                self.emit(depth, f"{operands[a]} = read_number(int)")
+            elif opcode == RINP:
+                self.emit(depth, f"{operands[a]} = read_number(float)")
+            elif opcode in RELATIONS:
+                self.emit(depth, f"{operands[a]} = 1 if {operands[b]} {RELATIONS[opcode]} {operands[c]} else 0")
+            elif opcode in ARITHMETIC:
+                self.emit(depth, f"{operands[a]} = {operands[b]} {ARITHMETIC[opcode]} {operands[c]}")
+            elif opcode == IDIV:
+                if c >= self.slots and self.constants[c] != 0:
+                    # a literal divisor is never zero
+                    self.emit(depth, f"{operands[a]} = truncating_division({operands[b]}, {operands[c]})")
+                else:
+                    self.emit(depth, f"{operands[a]} = integer_division({operands[b]}, {operands[c]}, {line})")
+            elif opcode == RDIV:
+                if c < self.slots:
+                    self.emit(depth, f"if {operands[c]} == 0: division_by_zero({line})")
+                elif self.constants[c] == 0:
+                    self.emit(depth, f"division_by_zero({line})")
+                self.emit(depth, f"{operands[a]} = {operands[b]} / {operands[c]}")
+            elif opcode == ITOR:
+                self.emit(depth, f"{operands[a]} = float({operands[b]})")
+            elif opcode == RTOI:
+                self.emit(depth, f"{operands[a]} = int({operands[b]})")
+            elif opcode == JUMP:
+                self.emit(depth, f"pc = {a}")
+                return
+            elif opcode == JMPZ:
+                if index + 1 == len(program):
+                    self.emit(depth, f"if {operands[b]} != 0: ran_past_end()")
+                    self.emit(depth, f"pc = {a}")
+                else:
+                    self.emit(depth, f"pc = {a} if {operands[b]} == 0 else {index + 1}")
+                return
+            elif opcode == HALT:
+                self.emit(depth, "break")
+                return
+
+        # the block falls through to the next one
+        if end == len(program):
+            self.emit(depth, "ran_past_end()")
+        else:
+            self.emit(depth, f"pc = {end}")
+
+def translate(program):
+    return Translator(program).translate()
+
+class TranspiledMachine(QudMachine):
+
+    # a QudMachine that runs the program as translated Python, the source is compiled once when it is created
+
+    def __init__(self, program, input_stream=None, output_stream=None):
+        super().__init__(program, input_stream, output_stream)
+        self.source = translate(program)
+        namespace = {
+            "integer_division": integer_division,
+            "truncating_division": truncating_division,
+            "division_by_zero": division_by_zero,
+            "ran_past_end": ran_past_end,
+        }
+        exec(compile(self.source, "<qud>", "exec"), namespace)
+        self.function = namespace["run"]
+
+    def run(self):
+        memory = self.program.initial_memory()
+        stats = [0]
+        start = time.perf_counter()
+        try:
+            self.function(memory, self.output_stream.write, self.read_number, stats)
+        finally:
+            self.elapsed = time.perf_counter() - start
+            self.executed = stats[0]
+        return memory
+
+def main():
+    parser = argparse.ArgumentParser(description='Run a QUD program translated to Python')
+    parser.add_argument('-f', '--file', type=Path, help='Path of the .qud or .qudb file to run', required=True)
+    parser.add_argument('--source', action='store_true', help='Print the generated Python instead of running it')
+    args = parser.parse_args()
+
+    try:
+        program = load(args.file)
+    except FileNotFoundError:
+        print('Input file not found', file=sys.stderr)
+        return
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return
+
+    if args.source:
+        print(translate(program), end="")
+        return
+
+    machine = TranspiledMachine(program)
+    try:
+        machine.run()
+    except Exception as e:
+        print(f"Runtime error: {e}", file=sys.stderr)
+    machine.report()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,305 @@
+import argparse
+import sys
+import time
+from pathlib import Path
+from consts import *
+
+# A virtual machine for .qud programs. Loading decodes every line once into an opcode index and operand
+# slots: variables, temps and literals all live in one memory list (literals are preloaded into their
+# slots), so running an instruction never parses or hashes a name. Jump targets are decoded to 0-based
+# instruction indexes.
+
+NO_OPERAND = -1
+
+# the operands of each opcode, "w" written, "r" read, "a" jump address
+OPERAND_ROLES = {
+    IASN: "wr", IPRT: "r", IINP: "w",
+    IEQL: "wrr", INQL: "wrr", ILSS: "wrr", IGRT: "wrr",
+    IADD: "wrr", ISUB: "wrr", IMLT: "wrr", IDIV: "wrr",
+    RASN: "wr", RPRT: "r", RINP: "w",
+    REQL: "wrr", RNQL: "wrr", RLSS: "wrr", RGRT: "wrr",
+    RADD: "wrr", RSUB: "wrr", RMLT: "wrr", RDIV: "wrr",
+    ITOR: "wr", RTOI: "wr",
+    JUMP: "a", JMPZ: "ar", HALT: "",
+}
+
+# opcodes that store a float, used to give never assigned float variables 0.0 rather than 0
+FLOAT_RESULT_OPCODES = frozenset((RASN, RINP, RADD, RSUB, RMLT, RDIV, ITOR))
+
+def truncating_division(left, right):
+    # IDIV rounds toward zero where Python's // rounds down. Every backend and the constant folder divide
+    # with this, it works on NumPy int arrays as well as on ints.
+    negative = (left < 0) != (right < 0)
+    return (abs(left) // abs(right)) * (1 - 2 * negative)
+
+class QudProgram:
+
+    # The decoded image of a .qud program. Memory slots are laid out as the names, then the int
+    # constants, then the float constants.
+
+    def __init__(self, opcodes, arg1, arg2, arg3, names, float_names, int_constants, float_constants):
+        self.opcodes = opcodes
+        self.arg1 = arg1
+        self.arg2 = arg2
+        self.arg3 = arg3
+        self.names = names
+        self.float_names = float_names
+        self.int_constants = int_constants
+        self.float_constants = float_constants
+
+    def initial_memory(self):
+        memory = [0.0 if is_float else 0 for is_float in self.float_names]
+        memory.extend(self.int_constants)
+        memory.extend(self.float_constants)
+        return memory
+
+    def __len__(self):
+        return len(self.opcodes)
+
+def parse_literal(text):
+    if text[0].isdigit() or text[0] in "+-.":
+        try:
+            return int(text)
+        except ValueError:
+            return float(text)
+    return None
+
+def decode(text, symbol_table=None):
+    # With the symbol table of the program, every declared variable takes its id as its slot and its
+    # declared type. Without one, variables get slots in the order they appear and are floats when a float
+    # is stored in them.
+    opcodes = []
+    args = ([], [], [])
+    names = {}
+    float_names = set()
+    if symbol_table is not None:
+        for name, var_type in symbol_table.declarations():
+            names[name] = len(names)
+            if var_type == FLOAT:
+                float_names.add(name)
+    int_constants = {}
+    float_constants = {}
+    halted = False
+
+    lines = text.splitlines()
+    for line_number, line in enumerate(lines, 1):
+        fields = line.split()
+        if not fields or fields[0] not in Opcode.__members__ or fields[0] == "LABEL":
+            # the compiler signs the file on the line after the final HALT
+            if halted and line_number == len(lines):
+                break
+            raise Exception(f"Invalid instruction on line {line_number}: {line}")
+
+        opcode = Opcode[fields[0]]
+        roles = OPERAND_ROLES[opcode]
+        if len(fields) - 1 != len(roles):
+            raise Exception(f"Wrong number of operands on line {line_number}: {line}")
+
+        opcodes.append(opcode)
+        halted = opcode == HALT
+        for position in range(3):
+            if position >= len(roles):
+                args[position].append(NO_OPERAND)
+                continue
+
+            field = fields[position + 1]
+            if roles[position] == "a":
+                args[position].append(int(field) - 1)
+                continue
+
+            literal = parse_literal(field)
+            if literal is None:
+                if roles[position] == "w" and opcode in FLOAT_RESULT_OPCODES:
+                    float_names.add(field)
+                args[position].append(names.setdefault(field, len(names)))
+            elif isinstance(literal, int):
+                args[position].append(("i", int_constants.setdefault(literal, len(int_constants))))
+            else:
+                args[position].append(("f", float_constants.setdefault(literal, len(float_constants))))
+
+    # constants get their final slots once the number of names is known
+    base = {"i": len(names), "f": len(names) + len(int_constants)}
+    for operands in args:
+        for index, operand in enumerate(operands):
+            if isinstance(operand, tuple):
+                operands[index] = base[operand[0]] + operand[1]
+
+    for opcode, address in zip(opcodes, args[0]):
+        if (opcode == JUMP or opcode == JMPZ) and not 0 <= address < len(opcodes):
+            raise Exception(f"Jump to line {address + 1} is outside the program")
+
+    return QudProgram(opcodes, args[0], args[1], args[2], list(names),
+                      [name in float_names for name in names], list(int_constants), list(float_constants))
+
+def load(path):
+    path = Path(path)
+    if path.suffix == ".qudb":
+        # imported here since the binary format is built on QudProgram
+        from qud_binary import load_binary
+        return load_binary(path)
+    return decode(path.read_text())
+
+class QudMachine:
+
+    def __init__(self, program, input_stream=None, output_stream=None):
+        self.program = program
+        self.input_stream = input_stream if input_stream is not None else sys.stdin
+        self.output_stream = output_stream if output_stream is not None else sys.stdout
+        self.executed = 0
+        self.elapsed = 0.0
+
+    def read_number(self, convert):
+        line = self.input_stream.readline()
+        try:
+            return convert(line.strip())
+        except ValueError:
+            raise Exception(f"Invalid input: {line.strip()!r}")
+
+    def dispatch_table(self, memory):
+        # one handler per opcode, each returns the index of the next instruction
+        write = self.output_stream.write
+        read_number = self.read_number
+
+        def iasn(a, b, c, pc):
+            memory[a] = memory[b]
+            return pc + 1
+
+        def prt(a, b, c, pc):
+            write(f"{memory[a]}\n")
+            return pc + 1
+
+        def iinp(a, b, c, pc):
+            memory[a] = read_number(int)
+            return pc + 1
+
+        def rinp(a, b, c, pc):
+            memory[a] = read_number(float)
+            return pc + 1
+
+        def eql(a, b, c, pc):
+            memory[a] = 1 if memory[b] == memory[c] else 0
+            return pc + 1
+
+        def nql(a, b, c, pc):
+            memory[a] = 1 if memory[b] != memory[c] else 0
+            return pc + 1
+
+        def lss(a, b, c, pc):
+            memory[a] = 1 if memory[b] < memory[c] else 0
+            return pc + 1
+
+        def grt(a, b, c, pc):
+            memory[a] = 1 if memory[b] > memory[c] else 0
+            return pc + 1
+
+        def add(a, b, c, pc):
+            memory[a] = memory[b] + memory[c]
+            return pc + 1
+
+        def sub(a, b, c, pc):
+            memory[a] = memory[b] - memory[c]
+            return pc + 1
+
+        def mlt(a, b, c, pc):
+            memory[a] = memory[b] * memory[c]
+            return pc + 1
+
+        def idiv(a, b, c, pc):
+            left = memory[b]
+            right = memory[c]
+            if right == 0:
+                raise Exception(f"Division by zero on line {pc + 1}")
+            memory[a] = truncating_division(left, right)
+            return pc + 1
+
+        def rdiv(a, b, c, pc):
+            if memory[c] == 0:
+                raise Exception(f"Division by zero on line {pc + 1}")
+            memory[a] = memory[b] / memory[c]
+            return pc + 1
+
+        def itor(a, b, c, pc):
+            memory[a] = float(memory[b])
+            return pc + 1
+
+        def rtoi(a, b, c, pc):
+            memory[a] = int(memory[b])
+            return pc + 1
+
+        def jump(a, b, c, pc):
+            return a
+
+        def jmpz(a, b, c, pc):
+            return a if memory[b] == 0 else pc + 1
+
+        def halt(a, b, c, pc):
+            return -1
+
+        table = [None] * len(OPERAND_ROLES)
+        for opcode, handler in (
+            (IASN, iasn), (IPRT, prt), (IINP, iinp),
+            (IEQL, eql), (INQL, nql), (ILSS, lss), (IGRT, grt),
+            (IADD, add), (ISUB, sub), (IMLT, mlt), (IDIV, idiv),
+            (RASN, iasn), (RPRT, prt), (RINP, rinp),
+            (REQL, eql), (RNQL, nql), (RLSS, lss), (RGRT, grt),
+            (RADD, add), (RSUB, sub), (RMLT, mlt), (RDIV, rdiv),
+            (ITOR, itor), (RTOI, rtoi),
+            (JUMP, jump), (JMPZ, jmpz), (HALT, halt),
+        ):
+            table[opcode] = handler
+        return table
+
+    def run(self):
+        program = self.program
+        memory = program.initial_memory()
+        table = self.dispatch_table(memory)
+
+        # the handler is looked up once per instruction here, not once per execution
+        code = [(table[opcode], a, b, c)
+                for opcode, a, b, c in zip(program.opcodes, program.arg1, program.arg2, program.arg3)]
+        end = len(code)
+
+        executed = 0
+        pc = 0
+        start = time.perf_counter()
+        try:
+            while pc >= 0:
+                if pc == end:
+                    raise Exception("Execution ran past the end of the program without reaching HALT")
+                handler, a, b, c = code[pc]
+                pc = handler(a, b, c, pc)
+                executed += 1
+        finally:
+            self.elapsed = time.perf_counter() - start
+            self.executed = executed
+
+        return memory
+
+    def report(self, stream=None):
+        rate = self.executed / self.elapsed if self.elapsed > 0 else 0.0
+        print(f"Executed {self.executed} instructions in {self.elapsed:.3f}s ({rate:,.0f} instructions/s)",
+              file=stream if stream is not None else sys.stderr)
+
+def main():
+    parser = argparse.ArgumentParser(description='QUD virtual machine')
+    parser.add_argument('-f', '--file', type=Path, help='Path of the .qud or .qudb file to run', required=True)
+    args = parser.parse_args()
+
+    try:
+        program = load(args.file)
+    except FileNotFoundError:
+        print('Input file not found', file=sys.stderr)
+        return
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return
+
+    machine = QudMachine(program)
+    try:
+        machine.run()
+    except Exception as e:
+        print(f"Runtime error: {e}", file=sys.stderr)
+    machine.report()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+from consts import HALT
+from quad import Quad, serialize
+from linker import link
+from optimizer import optimize
+
+# Writes a program to a .qud stream while it is being parsed. The parser hands over every top level
+# statement as soon as it is complete. Labels never cross a top level statement, so each one is linked on
+# its own, at the line where it starts in the file, and written out right away: memory holds one statement
+# at a time and the output starts before parsing ends.
+#
+# The optimization passes look at the whole program, so with an optimization level the statements are
+# collected and written when the writer is closed.
+
+SIGNATURE = "Adar Agai"
+
+class QudWriter:
+
+    def __init__(self, stream, level=0):
+        self.stream = stream
+        self.level = level
+        self.lines = 0
+        self.pending = []
+
+    def write(self, code):
+        if self.level:
+            self.pending.extend(code)
+        else:
+            self.emit(code)
+
+    def emit(self, quads):
+        program = link(quads, self.lines)
+        for line in serialize(program):
+            self.stream.write(line)
+            self.stream.write("\n")
+        self.lines += len(program)
+
+    def close(self):
+        if self.level:
+            self.emit(optimize(self.pending, self.level))
+            self.pending = []
+        self.emit([Quad(HALT)])
+        self.stream.write(SIGNATURE)
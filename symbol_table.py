@@ -1,17 +1,63 @@
+from array import array
+from consts import INT, FLOAT
+
+# the types array holds the index of a variable's type in TYPES
+TYPES = (INT, FLOAT)
+TYPE_CODES = {INT: 0, FLOAT: 1}
+
 class SymbolTable():
+
+    # Every declared variable is interned into a dense id, in declaration order, which is also its memory
+    # slot when the program is decoded with this table (qud_vm.decode). ids maps a name to its id, names and
+    # types are indexed by id.
+
     def __init__(self):
-        self.symbol_table = {}
+        self.ids = {}
+        self.names = []
+        self.types = array("B")
+
     def add(self, name, var_type):
-        if name not in self.symbol_table:
-            self.symbol_table[name] = var_type
+        # the id of the variable, a name that is already declared keeps its id and type
+        variable_id = self.ids.get(name)
+        if variable_id is None:
+            variable_id = self.ids[name] = len(self.names)
+            self.names.append(name)
+            self.types.append(TYPE_CODES[var_type])
+        return variable_id
+
     def get(self, name):
-        try:
-            return self.symbol_table[name]
-        except KeyError:
+        variable_id = self.ids.get(name)
+        if variable_id is None:
             return None
+        return TYPES[self.types[variable_id]]
+
     def contains(self, name):
-        return name in self.symbol_table
+        return name in self.ids
+
+    def id_of(self, name):
+        return self.ids.get(name)
+
+    def name_of(self, variable_id):
+        return self.names[variable_id]
+
+    def type_of(self, variable_id):
+        return TYPES[self.types[variable_id]]
+
+    def declarations(self):
+        return [(name, TYPES[code]) for name, code in zip(self.names, self.types)]
+
+    @classmethod
+    def from_declarations(cls, declarations):
+        symbol_table = cls()
+        for name, var_type in declarations:
+            symbol_table.add(name, var_type)
+        return symbol_table
+
+    def __len__(self):
+        return len(self.names)
+
     def __str__(self):
-        return str(self.symbol_table)
+        return str(dict(self.declarations()))
+
     def __repr__(self):
-        return str(self.symbol_table)
\ No newline at end of file
+        return str(dict(self.declarations()))
@@ -0,0 +1,169 @@
+import heapq
+from consts import *
+from quad import Quad, Operand, OperandKind, DEFINING_OPCODES
+from cfg import ControlFlowGraph
+
+# Local value numbering: within a basic block, a quad computing a temp from the same operation on the same
+# values as an earlier quad is dropped and its readers read the earlier temp. Every variable gets a new
+# value number when it is assigned or input, so a computation is only reused while its operands still hold
+# the same values, and an assignment gives the variable the value number of what it copies. The operands of
+# commutative operations are ordered, so a * b and b * a are the same value, and ITOR conversions are
+# numbered like any other operation.
+#
+# The code generator recycles temps, so an earlier temp is usually overwritten before it could be reused.
+# Every temp written in the block is first given a name of its own, and once the block is numbered the temps
+# are allocated again, each one freed after its last read, which brings the count back down. Temps read in
+# a block other than the one that writes them keep their names.
+
+COMMUTATIVE = frozenset((IADD, IMLT, RADD, RMLT, IEQL, INQL, REQL, RNQL))
+COMPUTATIONS = DEFINING_OPCODES - {IASN, RASN, IINP, RINP}
+
+def temp_type(temp):
+    return temp.name.split("_temp_")[0]
+
+def shared_temps(blocks):
+    # the temps some block reads before writing them
+    shared = set()
+    for block in blocks:
+        written = set()
+        for quad in block.quads:
+            for source in quad.used():
+                if source.kind == OperandKind.TEMP and source.name not in written:
+                    shared.add(source.name)
+            target = quad.defined()
+            if target is not None:
+                written.add(target.name)
+    return shared
+
+class BlockNumbering:
+
+    def __init__(self, shared):
+        self.shared = shared
+        self.values = {}
+        self.computed = {}
+        # the temp holding the value of each computation, for as long as the block runs
+        self.holders = {}
+        self.renamed = {}
+        self.fresh = []
+        self.count = 0
+
+    def new_value(self):
+        self.count += 1
+        return self.count
+
+    def value_of(self, operand):
+        if operand.is_literal():
+            return (operand.kind, operand.name)
+        value = self.values.get(operand.name)
+        if value is None:
+            value = self.values[operand.name] = self.new_value()
+        return value
+
+    def key(self, quad, sources):
+        values = [self.value_of(source) for source in sources]
+        if quad.opcode in COMMUTATIVE:
+            values.sort(key=repr)
+        return (quad.opcode, *values)
+
+    def number(self, quads):
+        numbered = []
+        for quad in quads:
+            sources = quad.used()
+            if self.renamed and any(source.name in self.renamed for source in sources):
+                quad = quad.replace_used(lambda operand: self.renamed.get(operand.name, operand))
+                sources = quad.used()
+
+            target = quad.defined()
+            if target is None:
+                numbered.append(quad)
+                continue
+
+            own_temp = target.kind == OperandKind.TEMP and target.name not in self.shared
+            key = self.key(quad, sources) if quad.opcode in COMPUTATIONS else None
+            if own_temp and key in self.holders:
+                self.renamed[target.name] = self.holders[key]
+                continue
+
+            if own_temp:
+                temp = Operand(OperandKind.TEMP, f"{temp_type(target)}_temp_v{len(self.fresh)}")
+                self.fresh.append(temp.name)
+                self.renamed[target.name] = temp
+                quad = Quad(quad.opcode, temp, quad.arg2, quad.arg3)
+            else:
+                self.renamed.pop(target.name, None)
+
+            if quad.opcode == IASN or quad.opcode == RASN:
+                self.values[quad.arg1.name] = self.value_of(quad.arg2)
+            elif key is not None:
+                value = self.computed.get(key)
+                if value is None:
+                    value = self.computed[key] = self.new_value()
+                self.values[quad.arg1.name] = value
+                if own_temp:
+                    self.holders[key] = quad.arg1
+            else:
+                self.values[quad.arg1.name] = self.new_value()
+            numbered.append(quad)
+        return numbered
+
+def allocate_temps(quads, fresh, shared):
+    # Gives the block's own temps their final names, the lowest free one of their type, and drops the
+    # computations whose temp is never read. A temp is free again after the quad with its last read.
+    # walking backwards, the first read of a temp is its last one
+    fresh = set(fresh)
+    live = set()
+    needed = []
+    for quad in reversed(quads):
+        target = quad.defined()
+        if (target is not None and target.name in fresh and target.name not in live
+                and quad.opcode != IINP and quad.opcode != RINP):
+            continue
+        if target is not None:
+            live.discard(target.name)
+        last_reads = []
+        for source in quad.used():
+            if source.name in fresh and source.name not in live:
+                live.add(source.name)
+                last_reads.append(source.name)
+        needed.append((quad, last_reads))
+    needed.reverse()
+
+    taken = set(shared)
+    free = {"int": [], "float": []}
+    counts = {"int": 0, "float": 0}
+    names = {}
+    numbers = {}
+
+    def allocate(kind):
+        if free[kind]:
+            return heapq.heappop(free[kind])
+        counts[kind] += 1
+        while f"{kind}_temp_{counts[kind]}" in taken:
+            counts[kind] += 1
+        return counts[kind]
+
+    allocated = []
+    for quad, last_reads in needed:
+        if names and any(source.name in names for source in quad.used()):
+            quad = quad.replace_used(lambda operand: names.get(operand.name, operand))
+        for name in last_reads:
+            heapq.heappush(free[temp_type(names[name])], numbers[name])
+
+        target = quad.defined()
+        if target is not None and target.name in fresh:
+            kind = temp_type(target)
+            numbers[target.name] = allocate(kind)
+            names[target.name] = Operand(OperandKind.TEMP, f"{kind}_temp_{numbers[target.name]}")
+            quad = Quad(quad.opcode, names[target.name], quad.arg2, quad.arg3)
+        allocated.append(quad)
+    return allocated
+
+def number_values(quads):
+    graph = ControlFlowGraph.from_quads(quads)
+    shared = shared_temps(graph.blocks)
+    for block in graph.blocks:
+        numbering = BlockNumbering(shared)
+        numbered = numbering.number(block.quads)
+        if numbering.fresh:
+            block.quads = allocate_temps(numbered, numbering.fresh, shared)
+    return graph.to_quads()